@@ -1,11 +1,11 @@
 from Backend.SystemController import system_controller
 from Backend.NaturalLanguageProcessor import nlp_processor
 from Backend.Automation import Automation as BasicAutomation
+from Backend.Tracing import traced
 import asyncio
 import json
-from dotenv import dotenv_values
+from Backend.Config import env_vars
 
-env_vars = dotenv_values(".env")
 Username = env_vars.get("Username", "User")
 
 class AdvancedAutomation:
@@ -24,8 +24,8 @@ class AdvancedAutomation:
                 "user": Username
             })
             
-            # Process with NLP
-            parsed_command = self.nlp_processor.process_command(user_input)
+            # Process with NLP, a blocking Groq call that must not hold up the shared event loop
+            parsed_command = await asyncio.to_thread(self.nlp_processor.process_command, user_input)
             
             if parsed_command["confidence"] < 0.3:
                 return "I'm not sure what you want me to do. Could you please rephrase that?"
@@ -202,6 +202,7 @@ class AdvancedAutomation:
 # Global advanced automation instance
 advanced_automation = AdvancedAutomation()
 
+@traced("advanced_system")
 async def ProcessAdvancedCommand(user_input):
     """Main function to process advanced commands"""
     return await advanced_automation.process_natural_command(user_input)
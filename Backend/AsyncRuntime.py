@@ -0,0 +1,126 @@
+import asyncio
+import threading
+import contextvars
+import concurrent.futures
+import queue
+
+class AsyncRuntime:
+    """A single long-lived event loop on a dedicated thread.
+
+    Backends submit their coroutines here instead of calling asyncio.run, so
+    the loop, and any clients or sessions bound to it, survive across turns.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        """Start the loop thread if it is not running yet and return the loop"""
+        with self.lock:
+            if self.loop and self.thread.is_alive():
+                return self.loop
+
+            loop = asyncio.new_event_loop()
+            ready = threading.Event()
+
+            def run_loop():
+                asyncio.set_event_loop(loop)
+                loop.call_soon(ready.set)
+                loop.run_forever()
+
+            self.thread = threading.Thread(target=run_loop, name="AsyncRuntime", daemon=True)
+            self.thread.start()
+            ready.wait()
+            self.loop = loop
+            return loop
+
+    def in_loop_thread(self):
+        return self.thread is not None and threading.current_thread() is self.thread
+
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the shared loop and return a thread-safe future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.start())
+
+    def run(self, coro, timeout=None):
+        """Run a coroutine on the shared loop and block the calling thread for its result"""
+        if self.in_loop_thread():
+            coro.close()
+            raise RuntimeError("AsyncRuntime.run called from the event loop thread, await the coroutine instead")
+
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def shutdown(self, timeout=5):
+        """Cancel outstanding tasks and stop the loop"""
+        with self.lock:
+            loop, thread = self.loop, self.thread
+            self.loop = None
+
+        if not loop or not thread.is_alive():
+            return
+
+        async def cancel_tasks():
+            tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+        try:
+            asyncio.run_coroutine_threadsafe(cancel_tasks(), loop).result(timeout)
+        except Exception as e:
+            print(f"Error cancelling runtime tasks: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+
+# Global runtime shared by all backends
+async_runtime = AsyncRuntime()
+
+def RunAsync(coro, timeout=None):
+    """Run a coroutine on the shared runtime from synchronous code"""
+    return async_runtime.run(coro, timeout)
+
+def SubmitAsync(coro):
+    """Schedule a coroutine on the shared runtime without waiting for it"""
+    return async_runtime.submit(coro)
+
+def IterateAsync(agen):
+    """Iterate an async generator from synchronous code, the generator runs on the shared runtime.
+    Closing the iterator early cancels the generator."""
+    if async_runtime.in_loop_thread():
+        raise RuntimeError("IterateAsync called from the event loop thread, iterate with async for instead")
+
+    items = queue.Queue()
+    finished = object()
+    # Tasks copy the current context, so spans opened by the generator join the caller's trace
+    context = contextvars.copy_context()
+
+    async def pump():
+        try:
+            async for item in agen:
+                items.put((item, None))
+            items.put((finished, None))
+        except Exception as e:
+            items.put((finished, e))
+        finally:
+            await agen.aclose()
+
+    async def run_in_context():
+        return await context.run(asyncio.ensure_future, pump())
+
+    future = async_runtime.submit(run_in_context())
+    try:
+        while True:
+            item, error = items.get()
+            if error:
+                raise error
+            if item is finished:
+                return
+            yield item
+    finally:
+        future.cancel()
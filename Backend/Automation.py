@@ -1,10 +1,11 @@
 from AppOpener import close, open as appopen
 from webbrowser import open as webopen
 from pywhatkit import search, playonyt
-from dotenv import dotenv_values
+from Backend.Config import env_vars
 from bs4 import BeautifulSoup
 from rich import print
-from groq import Groq
+from Backend.Clients import clients
+from Backend.Tracing import traced
 import webbrowser
 import subprocess
 import requests
@@ -12,7 +13,6 @@ import keyboard
 import asyncio
 import os
 
-env_vars = dotenv_values(".env")
 GroqAPIKey = env_vars.get("GroqAPIKey")
 
 classes = ["zCubwf", "hgKELc", "LTKOO SY7ric", "ZOLcW", "gsrt vk_bk FzvWSb YwPhnf", "pclqee", "tw-Data-text tw-text-small tw-ta",
@@ -21,11 +21,6 @@ classes = ["zCubwf", "hgKELc", "LTKOO SY7ric", "ZOLcW", "gsrt vk_bk FzvWSb YwPhn
 
 useragent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.75 Safari/537.36'
 
-# Initialize Groq client only if API key exists
-client = None
-if GroqAPIKey:
-    client = Groq(api_key=GroqAPIKey)
-
 professional_responses = [
     "Your satisfaction is my top priority; feel free to reach out if there's anything else I can help you with.",
     "I'm at your service for any additional questions or support you may need—don't hesitate to ask.",
@@ -54,14 +49,14 @@ def Content(topic):
             return False
 
     def ContentWriterAI(prompt):
-        if not client:
+        if not GroqAPIKey:
             print("Error: Groq API key not found. Please check your .env file.")
             return "Error: Unable to generate content - API key missing."
         
         try:
             messages.append({"role": "user", "content": f"{prompt}"})
 
-            completion = client.chat.completions.create(
+            completion = clients.groq.chat.completions.create(
                 model="llama-3.3-70b-versatile",
                 messages=SystemChatBot + messages,
                 max_tokens=2048,
@@ -270,6 +265,7 @@ async def TranslateAndExecute(commands: list[str]):
     else:
         print("No valid commands to execute")
 
+@traced("automation")
 async def Automation(commands: list[str]):
     print(f"Starting automation with commands: {commands}")
     results = []
@@ -0,0 +1,227 @@
+from collections import OrderedDict
+import threading
+import atexit
+import hashlib
+import json
+import math
+import time
+import os
+import re
+import weakref
+
+# Caches with a background save, flushed together at exit
+DelayedCaches = weakref.WeakSet()
+
+def FlushCaches():
+    """Write the pending background save of every cache now"""
+    for cache in list(DelayedCaches):
+        cache.flush()
+
+atexit.register(FlushCaches)
+
+class Cache:
+    """Thread-safe LRU cache with per-entry expiry and hit/miss counters.
+
+    With a path, entries are kept in a JSON file and reloaded on start, so the
+    cache survives restarts. Values must be JSON serialisable in that case.
+    With a save_delay the file is rewritten in the background at most once per
+    save_delay seconds instead of on every change, and once more by FlushCaches().
+    """
+
+    def __init__(self, path=None, max_entries=1024, ttl=None, save_delay=None):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.save_delay = save_delay
+        self.save_timer = None
+        self.entries = OrderedDict()  # key -> (value, expires or None)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.load()
+        if path and save_delay:
+            DelayedCaches.add(self)
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry[1] is not None and entry[1] < time.time():
+                del self.entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, ttl=None):
+        """Store a value, ttl overrides the cache default for this entry"""
+        ttl = self.ttl if ttl is None else ttl
+        with self.lock:
+            self.entries[key] = (value, time.time() + ttl if ttl else None)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        self.changed()
+
+    def delete(self, key):
+        with self.lock:
+            removed = self.entries.pop(key, None) is not None
+        if removed:
+            self.changed()
+        return removed
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        self.changed()
+
+    def changed(self):
+        """Persist a change, right away or batched in the background with a save_delay"""
+        if not self.path:
+            return
+        if not self.save_delay:
+            self.save()
+            return
+        with self.lock:
+            if self.save_timer is not None:
+                return
+            self.save_timer = threading.Timer(self.save_delay, self.flush)
+            self.save_timer.daemon = True
+            self.save_timer.start()
+
+    def flush(self):
+        """Write a pending background save now"""
+        with self.lock:
+            timer, self.save_timer = self.save_timer, None
+        if timer is not None:
+            timer.cancel()
+            self.save()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        entry = self.entries.get(key)
+        return entry is not None and (entry[1] is None or entry[1] >= time.time())
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 3),
+            "size": len(self.entries),
+        }
+
+    def load(self):
+        if not self.path:
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return
+        except Exception as e:
+            print(f"Error loading cache {self.path}: {e}")
+            return
+
+        now = time.time()
+        for key, value, expires in data.get("entries", []):
+            if expires is None or expires >= now:
+                self.entries[key] = (value, expires)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+        self.hits = data.get("hits", 0)
+        self.misses = data.get("misses", 0)
+
+    def save(self):
+        if not self.path:
+            return
+        try:
+            with self.lock:
+                data = {
+                    "entries": [[key, value, expires] for key, (value, expires) in self.entries.items()],
+                    "hits": self.hits,
+                    "misses": self.misses,
+                }
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                # Write then rename so a crash never leaves a half-written cache
+                temp_path = f"{self.path}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(data, f)
+                os.replace(temp_path, self.path)
+        except Exception as e:
+            print(f"Error saving cache {self.path}: {e}")
+
+# Words that change the phrasing of a question but not what it asks
+FillerWords = {"a", "an", "the", "please", "kindly", "jarvis", "hey", "ok", "okay", "so", "just", "really"}
+
+def ContentWords(text):
+    return [word for word in re.findall(r"[a-z0-9']+", text.lower()) if word not in FillerWords]
+
+def HashedEmbedding(text, dims=512):
+    """Cheap local embedding: hashed word and word-pair counts, L2 normalised.
+
+    Returned as a sparse {index: weight} dict with string keys so it survives a
+    JSON round trip unchanged.
+    """
+    words = ContentWords(text)
+    vector = {}
+    for term in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        # A stable digest, not hash(), so persisted vectors stay valid across runs
+        digest = hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest()
+        index = str(int.from_bytes(digest[:4], "little") % dims)
+        vector[index] = vector.get(index, 0.0) + (1.0 if digest[4] & 1 else -1.0)
+    norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+    return {index: weight / norm for index, weight in vector.items()} if norm else {}
+
+def CosineSimilarity(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(weight * b.get(index, 0.0) for index, weight in a.items())
+
+class SemanticCache(Cache):
+    """Cache looked up by meaning: a query hits when its embedding is close enough to a stored one.
+
+    Every word of the query other than filler must also be in the stored key,
+    so questions that differ in one word ("... in celsius", "... in fahrenheit")
+    never share an answer however close their embeddings are.
+    """
+
+    def __init__(self, path=None, max_entries=512, ttl=None, threshold=0.9, save_delay=None):
+        self.threshold = threshold
+        super().__init__(path, max_entries, ttl, save_delay)
+
+    def lookup(self, text):
+        """(value, similarity) of the closest live entry above the threshold, else (None, best similarity)"""
+        vector = HashedEmbedding(text)
+        words = set(ContentWords(text))
+        now = time.time()
+        best_key, best_score = None, 0.0
+
+        with self.lock:
+            for key, (entry, expires) in list(self.entries.items()):
+                if expires is not None and expires < now:
+                    del self.entries[key]
+                    continue
+                if key != text and not words <= set(ContentWords(key)):
+                    continue
+                score = 1.0 if key == text else CosineSimilarity(vector, entry["vector"])
+                if score > best_score:
+                    best_key, best_score = key, score
+
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return None, best_score
+            self.entries.move_to_end(best_key)
+            self.hits += 1
+            return self.entries[best_key][0]["value"], best_score
+
+    def store(self, text, value, ttl=None):
+        self.put(text, {"value": value, "vector": HashedEmbedding(text)}, ttl)
@@ -0,0 +1,118 @@
+from Backend.Config import env_vars
+from collections import deque
+import threading
+import json
+import os
+
+ChatLogPath = r"Data\ChatLog.jsonl"
+LegacyChatLogPath = r"Data\ChatLog.json"
+ChatLogTail = int(env_vars.get("ChatLogTail", "200"))
+
+class ChatLog:
+    """Append-only chat history, one JSON message per line.
+
+    Each turn is appended and fsynced instead of rewriting the whole log, so
+    the cost of saving does not grow with history and a crash can lose at
+    most the line being written. The most recent messages are kept in memory
+    for building prompts. An old ChatLog.json is migrated on first use.
+    """
+
+    def __init__(self, path=ChatLogPath, legacy_path=LegacyChatLogPath, tail_size=ChatLogTail):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.tail = deque(maxlen=tail_size)
+        self.count = 0
+        self.loaded = False
+        self.lock = threading.RLock()
+
+    def load(self):
+        with self.lock:
+            if self.loaded:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            if not os.path.exists(self.path):
+                self.migrate()
+
+            for message in self.read_all():
+                self.tail.append(message)
+                self.count += 1
+            self.loaded = True
+
+    def migrate(self):
+        """Convert the old single-document ChatLog.json into the line format"""
+        messages = []
+        try:
+            with open(self.legacy_path, "r", encoding="utf-8") as f:
+                messages = json.load(f)
+        except FileNotFoundError:
+            pass
+        except json.JSONDecodeError:
+            print("ChatLog.json is empty or corrupted. Starting a new chat log.")
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            for message in messages:
+                f.write(json.dumps(message) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+
+    def read_all(self):
+        """Every message in the log. A torn last line from a crash is cut off, other bad lines are skipped"""
+        with self.lock:
+            messages = []
+            good_end = 0
+            try:
+                with open(self.path, "rb") as f:
+                    for line in f:
+                        if not line.endswith(b"\n"):
+                            break
+                        try:
+                            messages.append(json.loads(line))
+                        except json.JSONDecodeError:
+                            print(f"Skipping corrupt chat log line at byte {good_end}")
+                        good_end += len(line)
+                    size = f.seek(0, os.SEEK_END)
+            except FileNotFoundError:
+                return messages
+
+            if size > good_end:
+                print("Chat log ends with an incomplete line, truncating it.")
+                with open(self.path, "r+b") as f:
+                    f.truncate(good_end)
+            return messages
+
+    def append(self, *messages):
+        """Durably append messages to the log"""
+        self.load()
+        data = "".join(json.dumps(message) + "\n" for message in messages)
+        with self.lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self.tail.extend(messages)
+            self.count += len(messages)
+
+    def append_turn(self, Query, Answer):
+        self.append({"role": "user", "content": f"{Query}"}, {"role": "assistant", "content": Answer})
+
+    def messages(self, limit=None):
+        """Copy of the most recent messages, oldest first"""
+        self.load()
+        with self.lock:
+            recent = list(self.tail)
+        return recent[-limit:] if limit else recent
+
+    def snapshot(self):
+        """(recent messages, total message count) taken together, so they agree while other threads append"""
+        self.load()
+        with self.lock:
+            return list(self.tail), self.count
+
+    def __len__(self):
+        self.load()
+        return self.count
+
+# Global chat log, loaded on first use
+chat_log = ChatLog()
@@ -1,20 +1,17 @@
-import json
-from json import load, dump
-from dotenv import dotenv_values
+from Backend.Config import env_vars
+from Backend.ChatLog import chat_log
+from Backend.ContextWindow import context_window
 import requests
 import datetime
-from Backend.Utils import AnswerModifier
-from groq import Groq
-
-env_vars = dotenv_values(".env")
+import re
+from Backend.Utils import StreamingAnswerModifier, QueryModifier
+from Backend.Cache import SemanticCache
+from Backend.Tracing import tracer, traced
+from Backend.RequestPolicy import llm_policy
 
 Username = env_vars.get("Username")
 Assistantname = env_vars.get("Assistantname")
-GroqAPIKey = env_vars.get("GroqAPIKey")
-
-client = Groq(api_key=GroqAPIKey)
-
-messages = []
+ResponseCacheEnabled = env_vars.get("ResponseCache", "True").lower() == "true"
 
 System = f"""Hello, I am {Username}, You are a very accurate and advanced AI chatbot named {Assistantname} which also has real-time up-to-date information from the internet.
 *** Do not tell time until I ask, do not talk too much, just answer the question.***
@@ -27,17 +24,6 @@ SystemChatBot = [
     {"role": "system", "content": System}
 ]
 
-try:
-    with open(r"Data\ChatLog.json", "r") as f:
-        messages = load(f)
-except FileNotFoundError:
-    with open(r"Data\ChatLog.json", "w") as f:
-        dump([], f)
-except json.JSONDecodeError:
-    print("ChatLog.json is empty or corrupted. Initializing with an empty list.")
-    with open(r"Data\ChatLog.json", "w") as f:
-        dump([], f)
-
 def RealtimeInformation():
     current_date_time = datetime.datetime.now()
     day = current_date_time.strftime("%A")
@@ -53,49 +39,138 @@ def RealtimeInformation():
     data += f"Time: {hour} hours, {minute} minutes, {second} seconds.\n"
     return data
 
-def ChatBot(Query):
-    """ This function sends the user's query to the chatbot and returns the AI's response """
-
-    try:
-        with open(r"Data\ChatLog.json", "r") as f:
-            messages = load(f)
-
-        messages.append({"role": "user", "content": f"{Query}"})
-
-        completion = client.chat.completions.create(
-            model="llama3-70b-8192",
-            messages=SystemChatBot + [{"role": "system", "content": RealtimeInformation()}] + messages,
-            max_tokens=1024,
-            temperature=0.7,
-            top_p=1,
-            stream=True,
-            stop=None
-        )
-
-        Answer = ""
-
-        for chunk in completion:
+# Answers to general questions, reused for the same or a near-identical question
+response_cache = SemanticCache(
+    r"Data\ResponseCache.json",
+    max_entries=int(env_vars.get("ResponseCacheSize", "512")),
+    ttl=float(env_vars.get("ResponseCacheTTL", str(24 * 3600))),
+    threshold=float(env_vars.get("ResponseCacheThreshold", "0.85")),
+    # Written in the background, not before the answer is returned
+    save_delay=float(env_vars.get("ResponseCacheSaveDelay", "5")),
+)
+
+# Questions that refer back to the conversation need the history, not a stored answer
+ContextualWords = re.compile(r"\b(it|that|this|these|those|them|he|she|they|his|her|their|again|previous|earlier|above|last|said|more)\b")
+# Answered from RealtimeInformation(), a stored answer would give a stale time or date
+TimeWords = re.compile(r"\b(time|date|day|today|tonight|tomorrow|yesterday|now|month|year)\b")
+
+def IsCacheable(Query):
+    query = Query.lower()
+    return ResponseCacheEnabled and not ContextualWords.search(query) and not TimeWords.search(query)
+
+def CachedAnswer(Query):
+    """Stored answer for a general question, None on a miss"""
+    if not IsCacheable(Query):
+        return None
+    with tracer.span("response_cache") as span:
+        Answer, similarity = response_cache.lookup(QueryModifier(Query))
+        span.set(hit=Answer is not None, similarity=round(similarity, 3))
+    return Answer
+
+def SaveChatTurn(Query, Answer):
+    """ Append a finished user/assistant exchange to the chat log """
+    chat_log.append_turn(Query, Answer)
+
+def ChatBotRequest(Query):
+    """Completion arguments for a chat query, with the recent history from the context window"""
+    messages = context_window.messages()
+    messages.append({"role": "user", "content": f"{Query}"})
+
+    return dict(
+        model="llama3-70b-8192",
+        messages=SystemChatBot + [{"role": "system", "content": RealtimeInformation()}] + messages,
+        max_tokens=1024,
+        temperature=0.7,
+        top_p=1,
+        stream=True,
+        stop=None
+    )
+
+def ChatBotStream(Query, cancel_event=None, persist=True):
+    """ Yield the answer to Query as cleaned text deltas while it is generated.
+    The turn is saved once the stream completes, unless persist=False or it was cancelled. """
+    modifier = StreamingAnswerModifier()
+    Answer = ""
+
+    with tracer.span("llm.completion", model="llama3-70b-8192") as span:
+        for chunk in llm_policy.stream(ChatBotRequest(Query)):
+            if cancel_event and cancel_event.is_set():
+                span.set(cancelled=True)
+                return
+            if chunk.choices[0].delta.content:
+                span.mark("first_token")
+                Answer += chunk.choices[0].delta.content
+                text = modifier.feed(chunk.choices[0].delta.content)
+                if text:
+                    yield text
+
+        text = modifier.flush()
+        if text:
+            yield text
+
+    if persist:
+        SaveChatTurn(Query, Answer.replace("</s>", ""))
+
+async def ChatBotStreamAsync(Query, cancel_event=None, persist=True):
+    """ Async generator version of ChatBotStream """
+    modifier = StreamingAnswerModifier()
+    Answer = ""
+
+    with tracer.span("llm.completion", model="llama3-70b-8192") as span:
+        async for chunk in llm_policy.stream_async(ChatBotRequest(Query)):
+            if cancel_event and cancel_event.is_set():
+                span.set(cancelled=True)
+                return
             if chunk.choices[0].delta.content:
+                span.mark("first_token")
                 Answer += chunk.choices[0].delta.content
+                text = modifier.feed(chunk.choices[0].delta.content)
+                if text:
+                    yield text
+
+        text = modifier.flush()
+        if text:
+            yield text
 
-        Answer = Answer.replace("</s>", "")
+    if persist:
+        SaveChatTurn(Query, Answer.replace("</s>", ""))
 
-        messages.append({"role": "assistant", "content": Answer})
+@traced("chatbot")
+def ChatBot(Query, on_token=None, cancel_event=None, persist=True):
+    """ This function sends the user's query to the chatbot and returns the AI's response.
+    If on_token is given it is called with every text delta as it streams in.
+    Setting cancel_event stops generation early; with persist=False the turn is not saved.
+    A failed turn is not saved either, the chat log itself is never discarded.
+    A repeated general question is answered from the response cache without a model call. """
 
-        with open(r"Data\ChatLog.json", "w") as f:
-            dump(messages, f, indent=4)
+    try:
+        Answer = CachedAnswer(Query)
+        if Answer is not None:
+            tracer.annotate(cache_hit=True)
+            if on_token:
+                on_token(Answer)
+            if persist:
+                SaveChatTurn(Query, Answer)
+            return Answer
 
-        return AnswerModifier(Answer)
+        Answer = ""
+        for text in ChatBotStream(Query, cancel_event, persist):
+            Answer += text
+            if on_token:
+                on_token(text)
+
+        if cancel_event and cancel_event.is_set():
+            return None
+        # Speculative answers (persist=False) may not be for a general query
+        if persist and Answer and IsCacheable(Query):
+            response_cache.store(QueryModifier(Query), Answer)
+        return Answer
 
     except requests.exceptions.RequestException as e:
         print(f"Connection error: {e}")
-        with open(r"Data\ChatLog.json", "w") as f:
-            dump([], f, indent=4)
         return "Connection error, please try again."
     except Exception as e:
         print(f"Error: {e}")
-        with open(r"Data\ChatLog.json", "w") as f:
-            dump([], f, indent=4)
         return "An error occurred, please try again."
 
 if __name__ == "__main__":
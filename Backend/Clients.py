@@ -0,0 +1,177 @@
+"""One pooled set of LLM clients shared by every backend.
+
+Groq and Cohere clients, sync and async, are created on first use over
+httpx clients with shared keep-alive pools and connection limits, so a
+turn reuses open TLS connections instead of each module holding its own.
+Every request is counted while it is in flight, including streamed
+responses until the stream is closed.
+
+The async clients belong to the shared event loop (Backend.AsyncRuntime).
+"""
+from Backend.Config import env_vars
+from collections import Counter
+import threading
+import httpx
+
+GroqAPIKey = env_vars.get("GroqAPIKey")
+CohereAPIKey = env_vars.get("CohereAPIKey")
+MaxConnections = int(env_vars.get("LLMMaxConnections", "20"))
+MaxKeepAlive = int(env_vars.get("LLMMaxKeepAlive", "10"))
+ConnectTimeout = float(env_vars.get("LLMConnectTimeout", "5"))
+RequestTimeout = float(env_vars.get("LLMRequestTimeout", "60"))
+
+class _CountedStream(httpx.SyncByteStream):
+    def __init__(self, stream, done):
+        self.stream = stream
+        self.done = done
+
+    def __iter__(self):
+        yield from self.stream
+
+    def close(self):
+        try:
+            self.stream.close()
+        finally:
+            self.done()
+
+class _AsyncCountedStream(httpx.AsyncByteStream):
+    def __init__(self, stream, done):
+        self.stream = stream
+        self.done = done
+
+    async def __aiter__(self):
+        async for chunk in self.stream:
+            yield chunk
+
+    async def aclose(self):
+        try:
+            await self.stream.aclose()
+        finally:
+            self.done()
+
+class CountingTransport(httpx.BaseTransport):
+    """Pooled transport that reports each request to the owner's in-flight counters"""
+
+    def __init__(self, owner, provider):
+        self.owner = owner
+        self.provider = provider
+        self.transport = httpx.HTTPTransport(limits=owner.limits)
+
+    def handle_request(self, request):
+        done = self.owner.started(self.provider)
+        try:
+            response = self.transport.handle_request(request)
+        except BaseException:
+            done()
+            raise
+        response.stream = _CountedStream(response.stream, done)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+class AsyncCountingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, owner, provider):
+        self.owner = owner
+        self.provider = provider
+        self.transport = httpx.AsyncHTTPTransport(limits=owner.limits)
+
+    async def handle_async_request(self, request):
+        done = self.owner.started(self.provider)
+        try:
+            response = await self.transport.handle_async_request(request)
+        except BaseException:
+            done()
+            raise
+        response.stream = _AsyncCountedStream(response.stream, done)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+class LLMClients:
+    """Lazily created, shared Groq and Cohere clients with in-flight request counts"""
+
+    def __init__(self, max_connections=MaxConnections, max_keepalive=MaxKeepAlive,
+                 connect_timeout=ConnectTimeout, request_timeout=RequestTimeout):
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive)
+        self.timeout = httpx.Timeout(request_timeout, connect=connect_timeout)
+        self.request_timeout = request_timeout
+        self.lock = threading.Lock()
+        self.clients = {}
+        self.in_flight = Counter()
+        self.requests = Counter()
+
+    def started(self, provider):
+        """Count a request as in flight, returns the callback that ends it"""
+        with self.lock:
+            self.in_flight[provider] += 1
+            self.requests[provider] += 1
+        finished = False
+
+        def done():
+            nonlocal finished
+            with self.lock:
+                if not finished:
+                    finished = True
+                    self.in_flight[provider] -= 1
+
+        return done
+
+    def get(self, name, create):
+        client = self.clients.get(name)
+        if client is None:
+            with self.lock:
+                client = self.clients.get(name)
+                if client is None:
+                    client = self.clients[name] = create()
+        return client
+
+    def use(self, **overrides):
+        """Replace clients by name (groq, async_groq, cohere, async_cohere), e.g. with local fakes"""
+        with self.lock:
+            self.clients.update(overrides)
+
+    @property
+    def groq(self):
+        def create():
+            from groq import Groq
+            http_client = httpx.Client(transport=CountingTransport(self, "groq"), timeout=self.timeout)
+            return Groq(api_key=GroqAPIKey, timeout=self.timeout, http_client=http_client)
+        return self.get("groq", create)
+
+    @property
+    def async_groq(self):
+        def create():
+            from groq import AsyncGroq
+            http_client = httpx.AsyncClient(transport=AsyncCountingTransport(self, "groq"), timeout=self.timeout)
+            # Streamed answers go through Backend.RequestPolicy, which does its own retries
+            return AsyncGroq(api_key=GroqAPIKey, timeout=self.timeout, max_retries=0, http_client=http_client)
+        return self.get("async_groq", create)
+
+    @property
+    def cohere(self):
+        def create():
+            import cohere
+            httpx_client = httpx.Client(transport=CountingTransport(self, "cohere"), timeout=self.timeout)
+            return cohere.Client(api_key=CohereAPIKey, timeout=self.request_timeout, httpx_client=httpx_client)
+        return self.get("cohere", create)
+
+    @property
+    def async_cohere(self):
+        def create():
+            import cohere
+            httpx_client = httpx.AsyncClient(transport=AsyncCountingTransport(self, "cohere"), timeout=self.timeout)
+            return cohere.AsyncClient(api_key=CohereAPIKey, timeout=self.request_timeout, httpx_client=httpx_client)
+        return self.get("async_cohere", create)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "in_flight": dict(self.in_flight),
+                "requests": dict(self.requests),
+                "clients": sorted(self.clients),
+            }
+
+# Global client layer
+clients = LLMClients()
@@ -0,0 +1,129 @@
+from Backend.ChatLog import chat_log
+from Backend.Clients import clients
+from Backend.Config import env_vars
+from Backend.Tracing import InThreadContext, tracer
+from Backend.Utils import EstimateTokens
+import threading
+import json
+import os
+
+ContextTokenBudget = int(env_vars.get("ContextTokenBudget", "3000"))
+SummaryModel = env_vars.get("SummaryModel", "llama3-8b-8192")
+SummaryBatch = 40
+SummaryPath = r"Data\ChatSummary.json"
+
+SummaryInstructions = """You maintain a running summary of a conversation between a user and an AI assistant.
+Merge the new messages into the existing summary. Keep names, facts, preferences and open questions the
+assistant may need later, drop small talk. Reply with the updated summary only, at most 200 words."""
+
+def MessageTokens(message):
+    return EstimateTokens(message["content"]) + 4
+
+def SummarizeConversation(Summary, Messages):
+    """Fold messages into the running summary with a small, fast model"""
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in Messages)
+    completion = clients.groq.chat.completions.create(
+        model=SummaryModel,
+        messages=[
+            {"role": "system", "content": SummaryInstructions},
+            {"role": "user", "content": f"Existing summary:\n{Summary or '(none)'}\n\nNew messages:\n{transcript}"},
+        ],
+        max_tokens=400,
+        temperature=0.3,
+    )
+    return completion.choices[0].message.content.strip()
+
+class ContextWindow:
+    """Chat history for a prompt, kept within a token budget.
+
+    The newest messages are sent verbatim; everything older is represented by
+    a rolling summary. The summary is refreshed on a background thread once
+    messages fall out of the window, so building a prompt never waits on it.
+    """
+
+    def __init__(self, log=chat_log, summarize=SummarizeConversation, budget=ContextTokenBudget, path=SummaryPath):
+        self.log = log
+        self.summarize = summarize
+        self.budget = budget
+        self.path = path
+        self.summary = ""
+        self.summarized = 0  # messages of the log folded into the summary
+        self.refreshing = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.summary = data.get("summary", "")
+            self.summarized = data.get("summarized", 0)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump({"summary": self.summary, "summarized": self.summarized}, f, indent=4)
+        except Exception as e:
+            print(f"Error saving chat summary: {e}")
+
+    def messages(self):
+        """Summary message (if any) followed by the most recent messages that fit the budget"""
+        recent, total = self.log.snapshot()
+
+        with self.lock:
+            summary = self.summary
+            summarized = self.summarized
+        used = EstimateTokens(summary) if summary else 0
+
+        kept = []
+        for message in reversed(recent):
+            tokens = MessageTokens(message)
+            if used + tokens > self.budget:
+                break
+            kept.append(message)
+            used += tokens
+        kept.reverse()
+
+        first_kept = total - len(kept)
+        if first_kept > summarized:
+            self.refresh(first_kept)
+        tracer.annotate(history_tokens=used, history_messages=len(kept), summarized=bool(summary))
+
+        if not summary:
+            return kept
+        return [{"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"}] + kept
+
+    def refresh(self, upto):
+        """Fold the messages before index upto into the summary, in the background"""
+        with self.lock:
+            if self.refreshing:
+                return
+            self.refreshing = True
+        threading.Thread(target=InThreadContext(lambda: self._refresh(upto)), daemon=True).start()
+
+    def _refresh(self, upto):
+        try:
+            while self.summarized < upto:
+                # Only the in-memory tail can be summarized, anything older is already gone from prompts
+                recent, total = self.log.snapshot()
+                tail_start = total - len(recent)
+                start = max(self.summarized, tail_start)
+                end = min(upto, start + SummaryBatch)
+                batch = recent[start - tail_start:end - tail_start]
+
+                summary = self.summarize(self.summary, batch) if batch else self.summary
+                with self.lock:
+                    self.summary = summary
+                    self.summarized = end
+                self.save()
+        except Exception as e:
+            print(f"Error refreshing chat summary: {e}")
+        finally:
+            with self.lock:
+                self.refreshing = False
+
+# Global context window shared by the chatbot and realtime search
+context_window = ContextWindow()
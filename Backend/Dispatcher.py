@@ -0,0 +1,92 @@
+import asyncio
+
+AutomationPrefixes = ("open", "close", "play", "system", "content", "google search", "youtube search")
+
+class Step:
+    """One unit of work planned from a Decision item"""
+
+    def __init__(self, index, kind, payload, keys):
+        self.index = index
+        self.kind = kind  # advanced_system, automation, image, answer, exit
+        self.payload = payload
+        self.keys = set(keys)
+        self.depends_on = []
+
+    def __repr__(self):
+        return f"Step({self.index}, {self.kind}, {self.payload!r}, depends_on={self.depends_on})"
+
+def ResourceKeys(kind, text):
+    """Resources a step touches; steps sharing a resource run in Decision order"""
+    words = {f"app:{word}" for word in text.lower().replace(".", " ").split()}
+    if kind == "advanced_system":
+        # System commands may build on each other (create a file, then copy it)
+        return {"advanced_system"} | words
+    if text.startswith(("open", "close")):
+        return {f"app:{word}" for word in text.split(maxsplit=1)[-1].lower().split()}
+    if text.startswith("system"):
+        return {"audio"}
+    return set()
+
+def PlanDecision(Decision):
+    """Turn a Decision list into steps with dependency-aware ordering.
+
+    General and realtime parts are merged into a single answer, realtime
+    winning if any part needs live data. Exit waits for everything else.
+    """
+    steps = []
+
+    def add(kind, payload, keys):
+        step = Step(len(steps), kind, payload, keys)
+        step.depends_on = [earlier.index for earlier in steps if earlier.keys & step.keys]
+        steps.append(step)
+
+    for item in Decision:
+        if item.startswith("advanced_system"):
+            command = item.removeprefix("advanced_system").strip()
+            add("advanced_system", command, ResourceKeys("advanced_system", command))
+        elif item.startswith("generate"):
+            add("image", item, {"image"})
+        elif item.startswith(AutomationPrefixes):
+            add("automation", item, ResourceKeys("automation", item))
+
+    answers = [" ".join(item.split()[1:]) for item in Decision if item.startswith(("general", "realtime"))]
+    if answers:
+        realtime = any(item.startswith("realtime") for item in Decision)
+        add("answer", (realtime, " and ".join(answers)), {"answer"})
+
+    if any(item.startswith("exit") for item in Decision):
+        step = Step(len(steps), "exit", None, set())
+        step.depends_on = [earlier.index for earlier in steps]
+        steps.append(step)
+
+    return steps
+
+async def Dispatch(steps, handlers, on_result=None):
+    """Run every step concurrently, each one after the steps it depends on.
+
+    handlers maps a step kind to an async callable taking the step. A failing
+    step yields its exception as the result and does not stop the others.
+    on_result(step, result) is called as soon as each step finishes.
+    """
+    tasks = {}
+
+    async def run(step):
+        if step.depends_on:
+            await asyncio.gather(*(tasks[i] for i in step.depends_on), return_exceptions=True)
+
+        handler = handlers.get(step.kind)
+        try:
+            result = await handler(step) if handler else None
+        except Exception as e:
+            print(f"Error in {step.kind} step: {e}")
+            result = e
+
+        if on_result:
+            on_result(step, result)
+        return result
+
+    for step in steps:
+        tasks[step.index] = asyncio.ensure_future(run(step))
+
+    results = await asyncio.gather(*tasks.values())
+    return list(zip(steps, results))
@@ -2,11 +2,10 @@ import cv2
 import face_recognition
 import numpy as np
 import os
-from dotenv import dotenv_values
+from Backend.Config import env_vars
 import threading
 import time
 
-env_vars = dotenv_values(".env")
 Username = env_vars.get("Username", "User")
 
 class FaceAuthenticator:
@@ -159,13 +158,23 @@ class FaceAuthenticator:
         """Quick authentication for testing"""
         return self.authenticate_face(timeout=10)
 
-# Global authenticator instance
-face_auth = FaceAuthenticator()
+# Global authenticator instance, created on first use because
+# loading it encodes every image in Data/Faces
+face_auth = None
+face_auth_lock = threading.Lock()
+
+def get_face_authenticator():
+    """Return the shared authenticator, loading known faces on first call"""
+    global face_auth
+    with face_auth_lock:
+        if face_auth is None:
+            face_auth = FaceAuthenticator()
+    return face_auth
 
 def authenticate_user():
     """Main authentication function"""
     print("Starting face authentication...")
-    return face_auth.authenticate_face()
+    return get_face_authenticator().authenticate_face()
 
 if __name__ == "__main__":
     # Test authentication
@@ -2,15 +2,24 @@ import asyncio
 from random import randint
 from PIL import Image
 import requests
-from dotenv import get_key
+from Backend.Config import env_vars
 import os
 from time import sleep
 import base64
 import json
+import threading
+import queue
+import time
+import uuid
+import concurrent.futures
+from Backend.AsyncRuntime import RunAsync, SubmitAsync
 
 # Set API URL and headers
 API_URL = "https://api-inference.huggingface.co/models/stabilityai/stable-diffusion-xl-base-1.0"
-headers = {"Authorization": f"Bearer {get_key('.env', 'HuggingFaceAPIKey')}"}
+headers = {"Authorization": f"Bearer {env_vars.get('HuggingFaceAPIKey')}"}
+
+# Reused across requests so the connection to the endpoint stays warm
+session = requests.Session()
 
 # Ensure the Data folder exists
 if not os.path.exists("Data"):
@@ -35,7 +44,7 @@ def open_images(prompt):
 
 async def query(payload):
     try:
-        response = await asyncio.to_thread(requests.post, API_URL, headers=headers, json=payload)
+        response = await asyncio.to_thread(session.post, API_URL, headers=headers, json=payload)
         response.raise_for_status()  # Raise an error for HTTP failures
         return response.content
     except requests.exceptions.RequestException as e:
@@ -43,6 +52,7 @@ async def query(payload):
         return None
 
 async def generate_images(prompt: str):
+    saved = []
     tasks = []
     for i in range(4):
         seed = randint(0, 1000000)
@@ -63,35 +73,139 @@ async def generate_images(prompt: str):
                     image_base64 = response_json["images"][0]
                     image_bytes = base64.b64decode(image_base64)
 
-                    with open(fr"Data\{prompt.replace(' ', '_')}{i + 1}.jpg", "wb") as f:
+                    image_path = fr"Data\{prompt.replace(' ', '_')}{i + 1}.jpg"
+                    with open(image_path, "wb") as f:
                         f.write(image_bytes)
+                    saved.append(image_path)
                 else:
                     print(f"Unexpected API response format: {response_json}")
             except Exception as e:
                 print(f"Error saving image {i + 1}: {e}")
 
+    return saved
+
 def GenerateImages(prompt: str):
-    asyncio.run(generate_images(prompt))
+    RunAsync(generate_images(prompt))
     open_images(prompt)
 
-# Main execution loop
-while True:
-    try:
-        with open(r"Frontend\Files\ImageGeneration.data", "r") as f:
-            data = str(f.read())
+class ImageGenerationJob:
+    """A single image generation request and its progress"""
+
+    def __init__(self, prompt):
+        self.id = uuid.uuid4().hex[:8]
+        self.prompt = prompt
+        self.status = "queued"  # queued, running, done, failed, cancelled
+        self.images = []
+        self.error = None
+        self.future = None
+        self.created = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "prompt": self.prompt,
+            "status": self.status,
+            "images": self.images,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+class ImageGenerationWorker:
+    """Persistent in-process worker that runs image generation jobs one at a time"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.job_queue = queue.Queue()
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread and self.thread.is_alive():
+                return
+            self.thread = threading.Thread(target=self._run, name="ImageGenerationWorker", daemon=True)
+            self.thread.start()
+
+    def add_listener(self, callback):
+        """Register callback(job) for every status change"""
+        self.listeners.append(callback)
+
+    def submit(self, prompt):
+        """Queue a prompt and return its job id"""
+        job = ImageGenerationJob(prompt)
+        with self.lock:
+            self.jobs[job.id] = job
+        self.start()
+        self.job_queue.put(job)
+        self._notify(job)
+        return job.id
+
+    def status(self, job_id):
+        """Return the job as a dict, or None for an unknown id"""
+        job = self.jobs.get(job_id)
+        return job.to_dict() if job else None
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job, returns False if it already finished"""
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if not job or job.status not in ("queued", "running"):
+                return False
+            job.status = "cancelled"
+            job.finished = time.time()
+            if job.future:
+                job.future.cancel()
+        self._notify(job)
+        return True
+
+    def _notify(self, job):
+        for callback in self.listeners:
+            try:
+                callback(job)
+            except Exception as e:
+                print(f"Error in image job listener: {e}")
+
+    def _finish(self, job, status, error=None):
+        with self.lock:
+            if job.status == "cancelled":
+                return False
+            job.status = status
+            job.error = error
+            job.finished = time.time()
+        self._notify(job)
+        return True
+
+    def _run(self):
+        while True:
+            job = self.job_queue.get()
+
+            with self.lock:
+                if job.status == "cancelled":
+                    continue
+                job.status = "running"
+                job.future = SubmitAsync(generate_images(job.prompt))
+            self._notify(job)
+            print(f"Generating Images for job {job.id}...")
 
-        prompt, status = data.split(",")
-        status = status.strip()
+            try:
+                job.images = job.future.result()
+            except concurrent.futures.CancelledError:
+                continue
+            except Exception as e:
+                self._finish(job, "failed", str(e))
+                continue
 
-        if status.lower() == "true":
-            print("Generating Images...")
-            GenerateImages(prompt=prompt)
+            if not job.images:
+                self._finish(job, "failed", "No images were returned")
+            elif self._finish(job, "done"):
+                open_images(job.prompt)
 
-            with open(r"Frontend\Files\ImageGeneration.data", "w") as f:
-                f.write("False, False")
-            break
-        else:
-            sleep(1)
+# Global image generation worker
+image_worker = ImageGenerationWorker()
 
-    except :
-        pass
\ No newline at end of file
+if __name__ == "__main__":
+    while True:
+        GenerateImages(input("Enter the image prompt : "))
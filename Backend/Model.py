@@ -1,11 +1,26 @@
-import cohere
 from rich import print
-from dotenv import dotenv_values
+from Backend.Config import env_vars
+from Backend.Tracing import tracer, traced
+from Backend.Cache import Cache
+from Backend.Clients import clients
+from Backend.AsyncRuntime import RunAsync
+from Backend.Utils import EstimateTokens
+from Backend.SnippetRanker import StopWords
+from collections import Counter
+import asyncio
+import math
+import json
+import sys
+import re
 
-env_vars = dotenv_values(".env")
-CohereAPIKey = env_vars["CohereAPIKey"]
+LocalClassifier = env_vars.get("LocalClassifier", "True").lower() == "true"
+CompactPrompt = env_vars.get("CompactPrompt", "True").lower() == "true"
+FewShotExamples = int(env_vars.get("FewShotExamples", "6"))
+ClassifierConcurrency = int(env_vars.get("ClassifierConcurrency", "8"))
+DecisionCacheSize = int(env_vars.get("DecisionCacheSize", "1024"))
+DecisionCacheTTL = float(env_vars.get("DecisionCacheTTL", str(7 * 24 * 3600)))
+DecisionCacheSaveDelay = float(env_vars.get("DecisionCacheSaveDelay", "5"))
 
-co = cohere.Client(api_key=CohereAPIKey)
 
 funcs = [
     "exit", "general", "realtime", "open", "close", "play",
@@ -13,7 +28,12 @@ funcs = [
     "youtube search", "reminder", "advanced_system"
 ]
 
-messages = []
+# Tasks of a decision are joined by ", ", a comma inside one ("general thanks, i really liked it.") joins nothing
+TaskBoundary = re.compile(r",\s*(?=(?:" + "|".join(re.escape(func) for func in funcs) + r")\b)")
+
+def SplitTasks(decision):
+    """The tasks of a decision string, split only where a comma starts a new task"""
+    return [task.strip() for task in TaskBoundary.split(decision) if task.strip()]
 
 preamble = """
 You are a very accurate Decision-Making Model for JARVIS AI Assistant, which decides what kind of a query is given to you.
@@ -123,30 +143,206 @@ ChatHistory = [
     {"role": "Chatbot", "message": "advanced_system terminate all chrome processes, advanced_system start calculator"}
 ]
 
-def FirstLayerDMM(prompt: str = "test"):
-    messages.append({"role": "user", "content": f"{prompt}"})
+ExamplePattern = re.compile(r"^\s*- '(.+)' -> '(.+)'\s*$", re.MULTILINE)
+TokenPattern = re.compile(r"[a-z0-9']+")
 
-    stream = co.chat(
-        model='command-r-plus',
-        message=prompt,
-        temperature=0.7,
-        chat_history=ChatHistory,
-        prompt_truncation='OFF',
-        connectors=[],
-        preamble=preamble
-    )
+def ExamplePairs():
+    """(query, decision) pairs from the preamble examples and ChatHistory"""
+    pairs = ExamplePattern.findall(preamble)
+    for user, bot in zip(ChatHistory[::2], ChatHistory[1::2]):
+        pairs.append((user["message"], bot["message"]))
+    # Some examples appear in both places
+    return list(dict.fromkeys(pairs))
+
+def ContentWords(text):
+    return {word for word in TokenPattern.findall(text.lower()) if word not in StopWords}
+
+def Tokenize(text):
+    words = TokenPattern.findall(text.lower())
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+class TfidfIndex:
+    """Small in-memory TF-IDF index, cosine similarity of a text against every document"""
+
+    def __init__(self, documents):
+        terms = [Counter(Tokenize(document)) for document in documents]
+        frequencies = Counter(term for document in terms for term in document)
+        count = len(terms)
+        self.idf = {term: math.log((1 + count) / (1 + df)) + 1 for term, df in frequencies.items()}
+        self.vectors = [self.vectorize(document) for document in terms]
+
+    def vectorize(self, terms):
+        vector = {term: tf * self.idf[term] for term, tf in terms.items() if term in self.idf}
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {term: weight / norm for term, weight in vector.items()} if norm else {}
+
+    def scores(self, text):
+        vector = self.vectorize(Counter(Tokenize(text)))
+        return [sum(weight * document.get(term, 0.0) for term, weight in vector.items()) for document in self.vectors]
+
+class LocalIntentClassifier:
+    """Classifies routine single-intent queries without a network call.
+
+    Unambiguous command phrasings are matched by prefix rules, other queries by
+    TF-IDF nearest neighbour over the example bank. Only the rules give
+    advanced_system, a query that merely resembles a system command is left to
+    Cohere. classify() returns None when it is not confident, e.g. for
+    multi-intent queries, and Cohere decides.
+    """
+
+    MultiIntent = re.compile(r",| and | then | also | after that ")
+    RealtimeWords = re.compile(r"\b(news|today|today's|tonight|latest|current|currently|recent|weather|score|price|stock|right now|this week)\b")
+    Rules = [
+        (re.compile(r"^(bye|goodbye|good bye|exit|quit)( jarvis)?$"), lambda m: "exit"),
+        (re.compile(r"^(mute|unmute)( the)?( volume| sound| audio)?$"), lambda m: f"system {m.group(1)}"),
+        (re.compile(r"^(turn |increase |raise )?(the )?volume up$|^(increase|raise|turn up) (the )?volume$"), lambda m: "system volume up"),
+        (re.compile(r"^(turn |decrease |lower )?(the )?volume down$|^(decrease|lower|turn down) (the )?volume$"), lambda m: "system volume down"),
+        (re.compile(r"^(google search|youtube search) (.+)$"), lambda m: f"{m.group(1)} {m.group(2)}"),
+        (re.compile(r"^(generate|create|make|draw) (an? )?(image|picture) (.+)$"), lambda m: f"generate image {m.group(4)}"),
+        # Only a piece of writing, "write down that i need milk" is not one
+        (re.compile(r"^write (me )?(an? |my )?((application|letter|cover letter|email|e-mail|essay|article|blog|report|speech|poem|"
+                    r"story|song|lyrics|note|message|paragraph|summary|review|code|program|script|function|python|java|javascript)\b.*)$"),
+         lambda m: f"content {m.group(3)}"),
+        # OS commands only with the object spelled out, "restart our conversation" or "kill time" is not one
+        (re.compile(r"^(kill|terminate) ([\w-]+\.exe|(all )?[\w.-]+ (browser|process|processes|app|application))$"),
+         lambda m: f"advanced_system {m.group(0)}"),
+        (re.compile(r"^(shutdown|shut down|restart|reboot|hibernate)( the| my)? (computer|pc|laptop|system|machine)$|^(shutdown|reboot|hibernate)$"),
+         lambda m: f"advanced_system {m.group(0)}"),
+        (re.compile(r"^ping [\w-]+(\.[\w-]+)+$|^(run command|execute) [\w.-]+$"), lambda m: f"advanced_system {m.group(0)}"),
+        (re.compile(r"^(delete|copy|move|create|make) (a |the )?(new )?(file|folder|directory) ((named|called) .+|[\w-]+\.\w+( .+)?)$"),
+         lambda m: f"advanced_system {m.group(0)}"),
+        (re.compile(r"^(open|close) (.+)$"), lambda m: f"{m.group(1)} {m.group(2)}"),
+        # Songs and videos, not "play a game with me" or "play along"
+        (re.compile(r"^play (?!(a game|games?|with|along|around|the role|dead|fair|hide|catch|it|that|this)\b)(.+)$"),
+         lambda m: f"play {m.group(2)}"),
+    ]
+
+    def __init__(self, pairs, threshold=0.5, margin=0.15):
+        self.threshold = threshold
+        self.margin = margin
+        examples = []
+        for query, decision in pairs:
+            # Multi-intent examples teach Cohere how to combine, not a single label
+            if "," in decision:
+                continue
+            label = next((func for func in funcs if decision.startswith(func)), None)
+            if label in ("general", "realtime", "advanced_system"):
+                examples.append((query, label))
+
+        self.labels = [label for _, label in examples]
+        self.words = [ContentWords(query) for query, _ in examples]
+        self.index = TfidfIndex([query for query, _ in examples])
+
+    def nearest(self, query):
+        """Best label with its cosine similarity and the margin over the best other label"""
+        words = ContentWords(query)
+        best = {}
+        for label, score, example_words in zip(self.labels, self.index.scores(query), self.words):
+            # Shared function words alone ("tell me about ...") say nothing about the intent
+            if words and not words & example_words:
+                continue
+            best[label] = max(best.get(label, 0.0), score)
+        if not best:
+            return None, 0.0, 0.0
+        ranked = sorted(best.items(), key=lambda item: -item[1])
+        runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+        return ranked[0][0], ranked[0][1], ranked[0][1] - runner_up
+
+    def classify(self, prompt):
+        """Decision list for a confident single-intent query, otherwise None"""
+        query = prompt.strip()
+        text = query.lower().rstrip(".!?").strip()
+        if not text or self.MultiIntent.search(text):
+            return None
+
+        for pattern, decision in self.Rules:
+            match = pattern.match(text)
+            if match:
+                return [decision(match)]
+
+        label, score, margin = self.nearest(text)
+        # Resembling a system command ("put my baby to sleep") is no reason to run one
+        if label not in ("general", "realtime") or score < self.threshold:
+            return None
+        if margin >= self.margin:
+            return [f"{label} {query.lower()}"]
+        # A close call between the two is settled by a live-data keyword
+        if label == "realtime" and self.RealtimeWords.search(text):
+            return [f"realtime {query.lower()}"]
+        return None
+
+# Global local classifier, built once from the prompt examples
+local_classifier = LocalIntentClassifier(ExamplePairs())
+
+# Cohere decisions keyed by normalized query. Only the classification is
+# reused, a cached realtime decision still searches for a fresh answer.
+# Written in the background, batch classification runs on the shared event loop
+decision_cache = Cache(r"Data\DecisionCache.json", DecisionCacheSize, DecisionCacheTTL, save_delay=DecisionCacheSaveDelay)
+
+def NormalizeQuery(prompt):
+    return " ".join(TokenPattern.findall(prompt.lower()))
+
+def StripExamples(text):
+    """The preamble's instructions without its inline examples"""
+    lines = [line for line in text.splitlines() if not ExamplePattern.match(line)]
+    lines = [re.sub(r"\s*Examples?:\s*$", "", line) for line in lines]
+    return "\n".join(lines)
+
+# Instructions sent on every call, the examples are picked per query
+CorePreamble = StripExamples(preamble)
+
+class FewShotSelector:
+    """Picks the example pairs most similar to a query for the few-shot chat history"""
+
+    def __init__(self, pairs, k=FewShotExamples):
+        self.pairs = pairs
+        self.k = k
+        self.index = TfidfIndex([query for query, _ in pairs])
+
+    def select(self, prompt, k=None):
+        scores = self.index.scores(prompt)
+        ranked = sorted(range(len(self.pairs)), key=lambda i: -scores[i])
+        chosen = ranked[:k or self.k]
+        # Always show a combined example so multi-part answers keep the comma format
+        if not any("," in self.pairs[i][1] for i in chosen):
+            combined = next(i for i in ranked if "," in self.pairs[i][1])
+            chosen[-1] = combined
+        # Most similar last, closest to the query
+        return [self.pairs[i] for i in reversed(chosen)]
+
+example_selector = FewShotSelector(ExamplePairs())
+
+def BuildPrompt(prompt, compact=CompactPrompt):
+    """Preamble, chat history and estimated input tokens for one classification call"""
+    if not compact:
+        history = ChatHistory
+        system = preamble
+    else:
+        history = []
+        for query, decision in example_selector.select(prompt):
+            history.append({"role": "User", "message": query})
+            history.append({"role": "Chatbot", "message": decision})
+        system = CorePreamble
+
+    tokens = EstimateTokens(system, prompt, *(turn["message"] for turn in history))
+    return system, history, tokens
 
-    response = ""
+def ResponseText(response):
+    """Text of a Cohere chat response, whether a response object or a stream of events"""
+    if isinstance(getattr(response, "text", None), str):
+        return response.text
 
-    for event in stream:
+    text = ""
+    for event in response:
         if hasattr(event, 'event_type') and event.event_type == "text-generation":
-            response += event.text
+            text += event.text
         elif isinstance(event, tuple) and len(event) == 2 and event[0] == 'text':
-            response += event[1]
+            text += event[1]
+    return text
 
-    response = response.replace("\n", "").strip()
-    response = response.split(",")
-    response = [i.strip() for i in response]
+def ParseDecision(text):
+    """Split a model reply into its recognised tasks (possibly none)"""
+    response = SplitTasks(text.replace("\n", "").strip())
 
     temp = []
     for task in response:
@@ -154,15 +350,182 @@ def FirstLayerDMM(prompt: str = "test"):
             if task.startswith(func):
                 temp.append(task)
                 break
-    
-    response = temp
 
+    return temp
+
+def CohereRequest(prompt, compact=CompactPrompt):
+    """Keyword arguments for one classification chat call"""
+    system, history, tokens = BuildPrompt(prompt, compact)
+    tracer.annotate(prompt_tokens=tokens, compact_prompt=compact)
+    return dict(
+        model='command-r-plus',
+        message=prompt,
+        temperature=0.7,
+        chat_history=history,
+        prompt_truncation='OFF',
+        connectors=[],
+        preamble=system
+    )
+
+def ClassifyWithCohere(prompt, compact=CompactPrompt):
+    """Ask Cohere for a decision, returns the recognised tasks (possibly none)"""
+    return ParseDecision(ResponseText(clients.cohere.chat(**CohereRequest(prompt, compact))))
+
+async def ClassifyWithCohereAsync(prompt, compact=CompactPrompt):
+    return ParseDecision(ResponseText(await clients.async_cohere.chat(**CohereRequest(prompt, compact))))
+
+def KnownDecision(prompt):
+    """Decision from the local classifier or the decision cache, None if Cohere is needed"""
+    if LocalClassifier:
+        decision = local_classifier.classify(prompt)
+        if decision:
+            tracer.annotate(source="local")
+            return decision
+
+    decision = decision_cache.get(NormalizeQuery(prompt))
+    if decision:
+        tracer.annotate(source="cache")
+        return list(decision)
+    tracer.annotate(source="cohere")
+    return None
+
+def StoreDecision(prompt, response):
+    """Cache a Cohere decision, or fall back to a general query if it had no tasks"""
     if not response or "(query)" in str(response):
         # Fallback to general query
         return [f"general {prompt}"]
-    
+
+    decision_cache.put(NormalizeQuery(prompt), response)
     return response
 
+@traced("dmm")
+def FirstLayerDMM(prompt: str = "test"):
+    return KnownDecision(prompt) or StoreDecision(prompt, ClassifyWithCohere(prompt))
+
+@traced("dmm")
+async def FirstLayerDMMAsync(prompt: str = "test"):
+    return KnownDecision(prompt) or StoreDecision(prompt, await ClassifyWithCohereAsync(prompt))
+
+async def FirstLayerDMM_batch_async(prompts, concurrency=ClassifierConcurrency):
+    """Classify many prompts with at most `concurrency` Cohere calls in flight.
+
+    Results come back in input order. Repeated prompts are classified once,
+    and a prompt that fails is reported and falls back to a general query.
+    """
+    limit = asyncio.Semaphore(concurrency)
+    tasks = {}
+
+    async def classify(prompt):
+        async with limit:
+            try:
+                return await FirstLayerDMMAsync(prompt)
+            except Exception as e:
+                print(f"Error classifying {prompt!r}: {e}")
+                return [f"general {prompt}"]
+
+    for prompt in prompts:
+        key = NormalizeQuery(prompt)
+        if key not in tasks:
+            tasks[key] = asyncio.ensure_future(classify(prompt))
+
+    await asyncio.gather(*tasks.values())
+    return [list(tasks[NormalizeQuery(prompt)].result()) for prompt in prompts]
+
+def FirstLayerDMM_batch(prompts, concurrency=ClassifierConcurrency):
+    """Blocking batch classification on the shared event loop"""
+    return RunAsync(FirstLayerDMM_batch_async(list(prompts), concurrency))
+
+def DecisionLabels(decision):
+    return [next((func for func in funcs if task.startswith(func)), task) for task in decision]
+
+def LoadTestSet(path):
+    """Labeled cases of a test set, each with its expected decision split into tasks"""
+    with open(path, "r", encoding="utf-8") as f:
+        cases = [json.loads(line) for line in f if line.strip()]
+    for case in cases:
+        case["expected"] = SplitTasks(case["decision"])
+    return cases
+
+def EvaluateLocalClassifier(path=r"Data\DecisionTestSet.jsonl"):
+    """Coverage and accuracy of the local classifier on a labeled test set.
+
+    coverage is the share of cases it answers instead of deferring to Cohere,
+    accuracy counts the answered cases with the expected task types in order.
+    Any advanced_system answer that was not expected is listed as unsafe.
+    """
+    cases = LoadTestSet(path)
+    answered = correct = 0
+    mistakes = []
+    unsafe = []
+    for case in cases:
+        decision = local_classifier.classify(case["query"])
+        if decision is None:
+            continue
+        answered += 1
+        if DecisionLabels(decision) == DecisionLabels(case["expected"]):
+            correct += 1
+            continue
+        mistakes.append({"query": case["query"], "expected": case["expected"], "decision": decision})
+        if "advanced_system" in DecisionLabels(decision) and "advanced_system" not in DecisionLabels(case["expected"]):
+            unsafe.append(case["query"])
+
+    return {
+        "cases": len(cases),
+        "coverage": round(answered / len(cases), 3) if cases else 0.0,
+        "accuracy": round(correct / answered, 3) if answered else 0.0,
+        "unsafe": unsafe,
+        "mistakes": mistakes,
+    }
+
+def EvaluateClassifier(path=r"Data\DecisionTestSet.jsonl", compact=CompactPrompt):
+    """Accuracy of the Cohere classifier on a labeled test set, bypassing the local classifier and cache.
+
+    A case counts as correct when the decision has the expected task types in
+    order; exact_accuracy also requires the same task text.
+    """
+    cases = LoadTestSet(path)
+
+    correct = exact = 0
+    tokens = []
+    mistakes = []
+    for case in cases:
+        expected = case["expected"]
+        tokens.append(BuildPrompt(case["query"], compact)[2])
+        try:
+            decision = ClassifyWithCohere(case["query"], compact) or [f"general {case['query']}"]
+        except Exception as e:
+            print(f"Error classifying {case['query']!r}: {e}")
+            decision = []
+
+        if DecisionLabels(decision) == DecisionLabels(expected):
+            correct += 1
+            exact += NormalizeQuery(", ".join(decision)) == NormalizeQuery(", ".join(expected))
+        else:
+            mistakes.append({"query": case["query"], "expected": expected, "decision": decision})
+
+    return {
+        "cases": len(cases),
+        "accuracy": round(correct / len(cases), 3) if cases else 0.0,
+        "exact_accuracy": round(exact / len(cases), 3) if cases else 0.0,
+        "mean_prompt_tokens": round(sum(tokens) / len(tokens), 1) if tokens else 0,
+        "mistakes": mistakes,
+    }
+
 if __name__ == "__main__":
+    if "--batch" in sys.argv:
+        # Classify one utterance per line, e.g. logged queries for routing analysis
+        with open(sys.argv[sys.argv.index("--batch") + 1], "r", encoding="utf-8") as f:
+            queries = [line.strip() for line in f if line.strip()]
+        for query, decision in zip(queries, FirstLayerDMM_batch(queries)):
+            print(json.dumps({"query": query, "decision": decision}))
+        sys.exit(0)
+
+    if "--evaluate" in sys.argv:
+        print("local", EvaluateLocalClassifier())
+        # Compare the compact prompt against the full preamble and few-shot history
+        for compact in (True, False):
+            print(f"compact={compact}", EvaluateClassifier(compact=compact))
+        sys.exit(0)
+
     while True:
         print(FirstLayerDMM(input(">>> ")))
\ No newline at end of file
@@ -1,13 +1,7 @@
-from groq import Groq
-from dotenv import dotenv_values
+from Backend.Clients import clients
 import re
 import json
 
-env_vars = dotenv_values(".env")
-GroqAPIKey = env_vars.get("GroqAPIKey")
-
-client = Groq(api_key=GroqAPIKey)
-
 class NaturalLanguageProcessor:
     def __init__(self):
         self.system_commands = {
@@ -105,7 +99,7 @@ class NaturalLanguageProcessor:
                 {"role": "user", "content": user_input}
             ]
             
-            completion = client.chat.completions.create(
+            completion = clients.groq.chat.completions.create(
                 model="llama3-70b-8192",
                 messages=messages,
                 max_tokens=512,
@@ -0,0 +1,134 @@
+"""Page retrieval for realtime search.
+
+Fetches the result pages of a search concurrently on the shared event loop,
+with a connection limit overall and per host and a hard deadline: pages that
+are not fetched and extracted in time are dropped instead of holding up the
+answer. Main text is extracted in a worker pool and split into passages,
+the passages most relevant to the query are returned without duplicates
+(Backend.SnippetRanker).
+"""
+from Backend.Config import env_vars
+from Backend.Tracing import tracer
+from Backend.SnippetRanker import RankPassages
+from concurrent.futures import ThreadPoolExecutor
+from bs4 import BeautifulSoup
+import aiohttp
+import asyncio
+import re
+
+PageFetching = env_vars.get("PageFetching", "True").lower() == "true"
+PageConcurrency = int(env_vars.get("PageConcurrency", "5"))
+PagePerHost = int(env_vars.get("PagePerHost", "2"))
+PageDeadline = float(env_vars.get("PageDeadline", "2.5"))
+PageSnippets = int(env_vars.get("PageSnippets", "6"))
+PageMaxBytes = 512 * 1024
+PassageWords = 60
+
+useragent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/100.0.4896.75 Safari/537.36'
+
+# Page parts that are never the main text
+BoilerplateTags = ["script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg", "button"]
+SentenceEnd = re.compile(r"(?<=[.!?])\s+")
+
+def ExtractText(html):
+    """Readable main text of a page: the article or main element if there is one, else the body"""
+    soup = BeautifulSoup(html, "html.parser")
+    for tag in soup(BoilerplateTags):
+        tag.decompose()
+    root = soup.find("article") or soup.find("main") or soup.body or soup
+    blocks = [block.get_text(" ", strip=True) for block in root.find_all(["p", "li", "h1", "h2", "h3"])]
+    # Short blocks are mostly menus, captions and buttons
+    return "\n".join(block for block in blocks if len(block.split()) >= 8)
+
+def Passages(text, size=PassageWords):
+    """Split text into passages of whole sentences, about size words each, never across paragraphs"""
+    passages = []
+    for paragraph in text.split("\n"):
+        current = []
+        length = 0
+        for sentence in SentenceEnd.split(paragraph):
+            words = len(sentence.split())
+            if current and length + words > size:
+                passages.append(" ".join(current))
+                current, length = [], 0
+            current.append(sentence)
+            length += words
+        if current:
+            passages.append(" ".join(current))
+    return passages
+
+def RankSnippets(query, pages, limit=PageSnippets):
+    """The passages of pages [(url, text)], given in search rank order, that best answer the query"""
+    passages = [{"url": url, "text": passage} for url, text in pages for passage in Passages(text)]
+    return RankPassages(query, passages, limit=limit)
+
+class PageFetcher:
+    """Concurrent page fetching and extraction with per-host limits and a deadline"""
+
+    def __init__(self, concurrency=PageConcurrency, per_host=PagePerHost, deadline=PageDeadline, max_bytes=PageMaxBytes, workers=4):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.deadline = deadline
+        self.max_bytes = max_bytes
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="PageExtract")
+        self.session = None
+
+    def get_session(self):
+        # Created on first use so it belongs to the shared loop, and kept so connections are reused
+        if self.session is None or self.session.closed:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.concurrency, limit_per_host=self.per_host),
+                timeout=aiohttp.ClientTimeout(total=self.deadline),
+                headers={"User-Agent": useragent},
+            )
+        return self.session
+
+    async def fetch(self, url):
+        """HTML of a page, None if it is not an HTML page"""
+        async with self.get_session().get(url) as response:
+            response.raise_for_status()
+            if "html" not in response.headers.get("Content-Type", "text/html"):
+                return None
+            # read(n) returns what is buffered so far, often just the <head>, so read until the end or the limit
+            body = bytearray()
+            async for chunk in response.content.iter_chunked(64 * 1024):
+                body.extend(chunk)
+                if len(body) >= self.max_bytes:
+                    del body[self.max_bytes:]
+                    break
+            return body.decode(response.charset or "utf-8", "replace")
+
+    async def page_text(self, url):
+        html = await self.fetch(url)
+        if not html:
+            return ""
+        return await asyncio.get_running_loop().run_in_executor(self.executor, ExtractText, html)
+
+    async def snippets(self, query, urls):
+        """Ranked snippets from whichever of the pages are fetched and extracted before the deadline"""
+        with tracer.span("page_fetch", pages=len(urls)) as span:
+            tasks = {asyncio.ensure_future(self.page_text(url)): url for url in urls}
+            if not tasks:
+                return []
+            done, pending = await asyncio.wait(tasks, timeout=self.deadline)
+            for task in pending:
+                task.cancel()
+
+            pages = []
+            failed = 0
+            for task, url in tasks.items():
+                if task not in done:
+                    continue
+                if task.exception() is not None:
+                    failed += 1
+                elif task.result():
+                    pages.append((url, task.result()))
+            span.set(fetched=len(pages), failed=failed, dropped=len(pending))
+            return RankSnippets(query, pages)
+
+    async def close(self):
+        if self.session and not self.session.closed:
+            await self.session.close()
+
+# Global fetcher, used from the shared event loop
+page_fetcher = PageFetcher()
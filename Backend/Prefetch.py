@@ -0,0 +1,102 @@
+"""Speculative prefetching.
+
+A fetch is started as soon as it looks likely to be needed, for example a
+web search once the transcript of a realtime-sounding query is final, while
+the query is still being classified. The result is kept for a short time
+and handed to the first caller that asks for the same key; a caller that
+asks while the fetch is still running waits for it instead of repeating it.
+"""
+from Backend.Config import env_vars
+from Backend.Cache import Cache
+from Backend.Tracing import InThreadContext, tracer
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+import threading
+import re
+
+RealtimePrefetch = env_vars.get("RealtimePrefetch", "True").lower() == "true"
+PrefetchTTL = float(env_vars.get("PrefetchTTL", "60"))
+
+# Cheap hint that a query needs live data, a wrong guess only costs one search
+RealtimeHint = re.compile(
+    r"\b(news|today|today's|tonight|latest|current|currently|recent|recently|weather|score|scores|price|"
+    r"stock|stocks|right now|this week|update|updates)\b|^(who|what) (is|was|are|were) (the )?(current|new|latest)\b|^who (is|was|are|were)\b"
+)
+MultiIntent = re.compile(r",| and | then | also | after that ")
+
+def RealtimeParts(text):
+    """The parts of a (possibly multi-intent) query that look like realtime questions"""
+    parts = [part.strip(" ?.!") for part in MultiIntent.split(text.lower())]
+    return [part for part in parts if part and RealtimeHint.search(part)]
+
+class Prefetcher:
+    """Runs fetches ahead of need and hands each result to the first caller asking for its key"""
+
+    def __init__(self, fetch, ttl=PrefetchTTL, max_entries=32, workers=2):
+        self.fetch = fetch
+        self.results = Cache(None, max_entries, ttl)
+        self.pending = {}  # key -> Future of a fetch still running
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="Prefetch")
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def start(self, key, *args):
+        """Fetch for key in the background unless it is already fetched or being fetched"""
+        with self.lock:
+            if key in self.pending or key in self.results:
+                return False
+            # Spans of the fetch join the trace of the turn that started it
+            future = self.executor.submit(InThreadContext(lambda: self.fetch(*args)))
+            self.pending[key] = future
+            self.counts["started"] += 1
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return True
+
+    def _finished(self, key, future):
+        with self.lock:
+            # A fetch that was waited for in take() already went to its caller
+            if self.pending.get(key) is not future:
+                return
+            del self.pending[key]
+            if future.cancelled():
+                return
+            if future.exception() is not None:
+                self.counts["failed"] += 1
+                print(f"Error prefetching {key!r}: {future.exception()}")
+            elif future.result() is not None:
+                self.results.put(key, future.result())
+
+    def take(self, key):
+        """The prefetched result for key, waiting for a fetch in progress, None if there is none.
+        A result is handed out once, the caller keeps it from then on."""
+        with self.lock:
+            future = self.pending.pop(key, None)
+
+        value = None
+        if future is not None:
+            # No timeout: the fetch has its own deadlines, and giving up on it only means
+            # the caller repeats the same search from the start
+            try:
+                value = future.result()
+            except Exception as e:
+                print(f"Error waiting for prefetch {key!r}: {e}")
+        else:
+            value = self.results.get(key)
+            self.results.delete(key)
+
+        with self.lock:
+            if value is None:
+                self.counts["misses"] += 1
+            else:
+                self.counts["hits"] += 1
+                if future is not None:
+                    self.counts["waited"] += 1
+        tracer.annotate(prefetched=value is not None)
+        return value
+
+    def __contains__(self, key):
+        return key in self.pending or key in self.results
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counts, pending=len(self.pending), ready=len(self.results))
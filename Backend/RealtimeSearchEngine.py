@@ -1,36 +1,121 @@
 from googlesearch import search
-from groq import Groq
-from json import load, dump
 import datetime
-from Backend.Utils import AnswerModifier
-from dotenv import dotenv_values
-
-env_vars = dotenv_values(".env")
+import asyncio
+import re
+from Backend.Utils import StreamingAnswerModifier
+from Backend.Cache import Cache, FillerWords
+from Backend.PageFetcher import page_fetcher, PageFetching
+from Backend.AsyncRuntime import RunAsync
+from Backend.SnippetRanker import RankPassages
+from Backend.Prefetch import Prefetcher, RealtimeParts, RealtimePrefetch
+from urllib.parse import urlparse
+from Backend.Tracing import tracer, traced
+from Backend.Config import env_vars
+from Backend.RequestPolicy import llm_policy
+from Backend.ChatLog import chat_log
+from Backend.ContextWindow import context_window
 
 Username = env_vars.get("Username")
 Assistantname = env_vars.get("Assistantname")
-GroqAPIKey = env_vars.get("GroqAPIKey")
-
-client = Groq(api_key=GroqAPIKey)
+SearchCacheSize = int(env_vars.get("SearchCacheSize", "256"))
+SearchCachePersist = env_vars.get("SearchCachePersist", "True").lower() == "true"
+SearchCacheSaveDelay = float(env_vars.get("SearchCacheSaveDelay", "5"))
+SearchTokenBudget = int(env_vars.get("SearchTokenBudget", "600"))
 
 System = f"""Hello, I am {Username}, You are a very accurate and advanced AI chatbot named {Assistantname} which has real-time up-to-date information from the internet.
 *** Provide Answers In a Professional Way, make sure to add full stops, commas, question marks, and use proper grammar.***
 *** Just answer the question from the provided data in a professional way. ***
 *** You are JARVIS, an advanced AI assistant. Be professional, intelligent, and helpful. ***"""
 
-try:
-    with open(r"Data\ChatLog.json", "r") as f:
-        messages = load(f)
-except:
-    with open(r"Data\ChatLog.json", "w") as f:
-        dump([], f)
-
+# How long search results stay fresh, by what the query is about. The first matching topic wins,
+# so "who is winning the match" is treated as live, not reference
+SearchTopics = [
+    ("live", re.compile(r"\b(live|scores?|match|weather|forecast|temperature|stocks?|shares?|price|prices|rate|traffic)\b"), 5 * 60),
+    ("news", re.compile(r"\b(news|headlines?|latest|breaking|today|tonight|yesterday|this week|current|trending|update)\b"), 15 * 60),
+    ("reference", re.compile(r"^(who (is|was|were)|what (is|was|are|were)|define|definition of|meaning of|history of|biography of|when (was|did))\b"), 7 * 24 * 3600),
+]
+SearchDefaultTTL = 3600
+
+def NormalizeSearchQuery(query):
+    words = re.findall(r"[a-z0-9']+", query.lower())
+    return " ".join(word for word in words if word not in FillerWords)
+
+def SearchTopic(query):
+    """(topic, ttl in seconds) for a normalized query"""
+    for topic, pattern, ttl in SearchTopics:
+        if pattern.search(query):
+            return topic, ttl
+    return "general", SearchDefaultTTL
+
+# Recent search results by normalized query, each entry expires with its topic's TTL.
+# Written in the background, not before the answer is generated
+search_cache = Cache(r"Data\SearchCache.json" if SearchCachePersist else None, SearchCacheSize, save_delay=SearchCacheSaveDelay)
+
+def FetchSearchResults(query):
+    """{"results": [title, description, url], "snippets": [url, text, score]} fresh from the web.
+    Snippets are the best passages of the result pages."""
+    results = [
+        {"title": result.title, "description": result.description, "url": result.url}
+        for result in search(query, advanced=True, num_results=5)
+    ]
+    snippets = []
+    if PageFetching and results:
+        try:
+            snippets = RunAsync(page_fetcher.snippets(query, [result["url"] for result in results]))
+        except Exception as e:
+            print(f"Error fetching result pages: {e}")
+    return {"results": results, "snippets": snippets}
+
+# Searches started from a transcript before the query is classified, see PrefetchSearch
+search_prefetcher = Prefetcher(FetchSearchResults)
+
+def SearchResults(query):
+    """Search results for a query: prefetched if a prefetch for it ran, else from the search cache
+    while fresh, else fetched now"""
+    key = NormalizeSearchQuery(query)
+    topic, ttl = SearchTopic(key)
+    source = "prefetch"
+    found = search_prefetcher.take(key) if key in search_prefetcher else None
+    if found is None:
+        source = "cache"
+        found = search_cache.get(key)
+    if found is None:
+        source = "search"
+        found = FetchSearchResults(query)
+    tracer.annotate(topic=topic, source=source)
+
+    # An empty result is more likely a blocked scrape than a real answer, do not keep it
+    if source != "cache" and found["results"]:
+        search_cache.put(key, found, ttl)
+    return found
+
+def PrefetchSearch(text):
+    """Start searching for the parts of a final transcript that look like realtime questions,
+    so the search overlaps classification. Returns the number of searches started."""
+    if not RealtimePrefetch:
+        return 0
+    started = 0
+    for part in RealtimeParts(text):
+        key = NormalizeSearchQuery(part)
+        if key and key not in search_cache and search_prefetcher.start(key, part):
+            started += 1
+    return started
+
+@traced("search")
 def GoogleSearch(query):
-    results = list(search(query, advanced=True, num_results=5))
-    Answer = f"The search results for '{query}' are :\n[start]\n"
+    """Search block for the prompt: the result descriptions and page extracts that best match
+    the query, ranked and deduplicated, within SearchTokenBudget"""
+    found = SearchResults(query)
+    passages = [
+        {"text": f"{result['title']}: {result['description']}", "url": result["url"]}
+        for result in found["results"] if result["description"]
+    ] + found["snippets"]
+    selected = RankPassages(query, passages, budget=SearchTokenBudget)
+    tracer.annotate(passages=len(passages), kept=len(selected))
 
-    for i in results:
-        Answer += f"Title: {i.title}\nDescription: {i.description}\n\n"
+    Answer = f"The search results for '{query}' are :\n[start]\n"
+    for passage in selected:
+        Answer += f"- {passage['text']} ({urlparse(passage['url']).hostname})\n"
 
     Answer += "[end]"
     return Answer
@@ -42,35 +127,22 @@ SystemChatBot = [
 ]
 
 def Information():
-    data = ""
-    current_date_time = datetime.datetime.now()
-    day = current_date_time.strftime("%A")
-    date = current_date_time.strftime("%d")
-    month = current_date_time.strftime("%B")
-    year = current_date_time.strftime("%Y")
-    hour = current_date_time.strftime("%H")
-    minute = current_date_time.strftime("%M")
-    second = current_date_time.strftime("%S")
-    data += f"Use This Real-time Information if needed:\n"
-    data += f"Day: {day}\n"
-    data += f"Date: {date}\n"
-    data += f"Month: {month}\n"
-    data += f"Year: {year}\n"
-    data += f"Time: {hour} hours: {minute} minutes: {second} seconds.\n"
-    return data
-
-def RealtimeSearchEngine(prompt):
-    global SystemChatBot, messages
-
-    with open(r"Data\ChatLog.json", "r") as f:
-        messages = load(f)
+    # One line instead of a field per line, the model reads it just as well
+    return f"Use This Real-time Information if needed: {datetime.datetime.now().strftime('%A %d %B %Y, %H:%M:%S')}"
+
+def RealtimeRequest(prompt, SearchResults):
+    """Completion arguments for one realtime query.
+    The prompt is built fresh for each request and nothing shared is modified,
+    so concurrent queries never see each other's search results."""
+    messages = context_window.messages()
     messages.append({"role": "user", "content": f"{prompt}"})
 
-    SystemChatBot.append({"role": "system", "content": GoogleSearch(prompt)})
-
-    completion = client.chat.completions.create(
+    return dict(
         model="llama3-70b-8192",
-        messages=SystemChatBot + [{"role": "system", "content": Information()}] + messages,
+        messages=SystemChatBot + [
+            {"role": "system", "content": SearchResults},
+            {"role": "system", "content": Information()},
+        ] + messages,
         max_tokens=2048,
         temperature=0.7,
         top_p=1,
@@ -78,20 +150,57 @@ def RealtimeSearchEngine(prompt):
         stop=None
     )
 
+def RealtimeSearchEngineStream(prompt):
+    """Yield the answer to a query from live search results as cleaned text deltas, saving the turn at the end"""
+    request = RealtimeRequest(prompt, GoogleSearch(prompt))
+    modifier = StreamingAnswerModifier()
+    Answer = ""
+
+    with tracer.span("llm.completion", model="llama3-70b-8192") as span:
+        for chunk in llm_policy.stream(request):
+            if chunk.choices[0].delta.content:
+                span.mark("first_token")
+                Answer += chunk.choices[0].delta.content
+                text = modifier.feed(chunk.choices[0].delta.content)
+                if text:
+                    yield text
+
+        text = modifier.flush()
+        if text:
+            yield text
+
+    chat_log.append_turn(prompt, Answer.strip().replace("</s>", ""))
+
+async def RealtimeSearchEngineStreamAsync(prompt):
+    """Async generator version of RealtimeSearchEngineStream"""
+    request = RealtimeRequest(prompt, await asyncio.to_thread(GoogleSearch, prompt))
+    modifier = StreamingAnswerModifier()
     Answer = ""
 
-    for chunk in completion:
-        if chunk.choices[0].delta.content:
-            Answer += chunk.choices[0].delta.content
+    with tracer.span("llm.completion", model="llama3-70b-8192") as span:
+        async for chunk in llm_policy.stream_async(request):
+            if chunk.choices[0].delta.content:
+                span.mark("first_token")
+                Answer += chunk.choices[0].delta.content
+                text = modifier.feed(chunk.choices[0].delta.content)
+                if text:
+                    yield text
 
-    Answer = Answer.strip().replace("</s>", "")
-    messages.append({"role": "assistant", "content": Answer})
+        text = modifier.flush()
+        if text:
+            yield text
 
-    with open(r"Data\ChatLog.json", "w") as f:
-        dump(messages, f, indent=4)
+    chat_log.append_turn(prompt, Answer.strip().replace("</s>", ""))
 
-    SystemChatBot.pop()
-    return AnswerModifier(Answer=Answer)
+@traced("realtime")
+def RealtimeSearchEngine(prompt, on_token=None):
+    """Answer a query from live search results, on_token receives each streamed text delta"""
+    Answer = ""
+    for text in RealtimeSearchEngineStream(prompt):
+        Answer += text
+        if on_token:
+            on_token(text)
+    return Answer
 
 if __name__ == "__main__":
     while True:
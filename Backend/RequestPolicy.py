@@ -0,0 +1,268 @@
+"""Request policy for streamed LLM calls: retries, hedging and failover.
+
+A completion is first sent to the primary target. If its first chunk has not
+arrived within the p95 of the primary's recent first-token latencies, the
+same request is sent to the secondary target as well, the first to produce
+a chunk wins and the other is cancelled. Errors that can be retried (429,
+5xx, timeouts) are retried with jittered backoff that waits at least as long
+as the provider's rate-limit headers ask; once the primary gives up the
+request fails over to the secondary.
+
+Runs on the shared event loop (Backend.AsyncRuntime), stream() bridges it
+to synchronous callers.
+"""
+from Backend.Config import env_vars
+from Backend.Tracing import tracer, Percentile
+from Backend.AsyncRuntime import IterateAsync
+from Backend.Clients import clients
+from collections import Counter, deque
+import threading
+import asyncio
+import inspect
+import random
+import time
+import re
+
+HedgeRequests = env_vars.get("HedgeRequests", "True").lower() == "true"
+FallbackModel = env_vars.get("FallbackModel", "llama3-8b-8192")
+HedgeDelay = float(env_vars.get("HedgeDelay", "1.5"))  # until enough first-token samples are in
+HedgeMinDelay = float(env_vars.get("HedgeMinDelay", "0.25"))
+LLMMaxRetries = int(env_vars.get("LLMMaxRetries", "2"))
+RetryBaseDelay = 0.5
+RetryMaxDelay = 8.0
+# A target that asks us to wait longer than this is skipped in favour of the fallback
+RetryMaxWait = float(env_vars.get("RetryMaxWait", "10"))
+
+RetryableStatus = {408, 409, 429, 500, 502, 503, 504}
+DurationPart = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+DurationUnits = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def ParseDuration(value):
+    """Seconds in a header value, either plain seconds ('1.5') or Groq's reset format ('1m2.5s', '250ms')"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = DurationPart.findall(value)
+    return sum(float(amount) * DurationUnits[unit] for amount, unit in parts) if parts else None
+
+def RetryAfter(error):
+    """Seconds the provider asked us to wait before retrying, None if it did not say"""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+
+    retry_ms = ParseDuration(headers.get("retry-after-ms"))
+    if retry_ms is not None:
+        return retry_ms / 1000
+    retry_after = ParseDuration(headers.get("retry-after"))
+    if retry_after is not None:
+        return retry_after
+
+    # Without Retry-After, wait for the reset of whichever limit is used up
+    resets = [
+        ParseDuration(headers.get(f"x-ratelimit-reset-{limit}"))
+        for limit in ("requests", "tokens")
+        if headers.get(f"x-ratelimit-remaining-{limit}") == "0"
+    ]
+    resets = [reset for reset in resets if reset is not None]
+    return max(resets) if resets else None
+
+def IsRetryable(error):
+    status = getattr(error, "status_code", None)
+    if status is not None:
+        return status in RetryableStatus
+    # Connection errors and timeouts carry no status code
+    return isinstance(error, (TimeoutError, ConnectionError)) or type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+def Backoff(attempt, retry_after=None, base=RetryBaseDelay, cap=RetryMaxDelay):
+    """Full-jitter exponential backoff, never shorter than the provider's retry-after"""
+    delay = random.uniform(0, min(cap, base * 2 ** attempt))
+    if retry_after is not None:
+        # A little spread on top so callers told the same time do not all come back at once
+        delay = retry_after + delay * 0.1
+    return delay
+
+async def CloseStream(stream):
+    close = getattr(stream, "aclose", None) or getattr(stream, "close", None)
+    if close:
+        try:
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            print(f"Error closing stream: {e}")
+
+class LatencyWindow:
+    """Recent first-token latencies of one target, for an adaptive hedge delay"""
+
+    def __init__(self, size=200, min_samples=20, default=HedgeDelay, floor=HedgeMinDelay):
+        self.samples = deque(maxlen=size)
+        self.min_samples = min_samples
+        self.default = default
+        self.floor = floor
+        self.lock = threading.Lock()
+
+    def add(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+
+    def threshold(self):
+        with self.lock:
+            samples = sorted(self.samples)
+        if len(samples) < self.min_samples:
+            return self.default
+        return max(self.floor, Percentile(samples, 95))
+
+class Target:
+    """Where a request can go: a client, looked up on every call so it can be swapped, and an optional model"""
+
+    def __init__(self, name, client, model=None):
+        self.name = name
+        self.client = client
+        self.model = model
+        self.latency = LatencyWindow()
+
+class OpenStream:
+    """A completion stream whose first chunk has arrived (first is None for an empty stream)"""
+
+    def __init__(self, target, stream, iterator, first):
+        self.target = target
+        self.stream = stream
+        self.iterator = iterator
+        self.first = first
+
+class RequestPolicy:
+    """Retries, hedging and failover for streamed chat completions"""
+
+    def __init__(self, primary, secondary=None, max_retries=LLMMaxRetries, hedge=HedgeRequests, max_retry_wait=RetryMaxWait):
+        self.primary = primary
+        self.secondary = secondary
+        self.max_retries = max_retries
+        self.hedge = hedge
+        self.max_retry_wait = max_retry_wait
+        self.counts = Counter()
+        self.lock = threading.Lock()
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    async def open(self, target, request):
+        """Start a streamed completion on target and wait for its first chunk, retrying what can be retried"""
+        if target.model:
+            request = dict(request, model=target.model)
+
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            stream = None
+            try:
+                stream = await target.client().chat.completions.create(**request)
+                iterator = stream.__aiter__()
+                try:
+                    first = await iterator.__anext__()
+                except StopAsyncIteration:
+                    first = None
+                target.latency.add(time.perf_counter() - started)
+                return OpenStream(target, stream, iterator, first)
+
+            except BaseException as e:
+                if stream is not None:
+                    await CloseStream(stream)
+                if not isinstance(e, Exception):
+                    raise
+                retry_after = RetryAfter(e)
+                if attempt >= self.max_retries or not IsRetryable(e) or (retry_after or 0) > self.max_retry_wait:
+                    raise
+                self.count("retries")
+                attempt += 1
+                tracer.annotate(**{f"{target.name}_retries": attempt})
+                await asyncio.sleep(Backoff(attempt - 1, retry_after))
+
+    async def first_response(self, request):
+        """The first target to produce a chunk, hedging a slow primary and failing over when it errors"""
+        tasks = {}
+        started = []
+        requested = time.perf_counter()
+        hedge_after = 0.0
+
+        def start(target):
+            started.append(target)
+            tasks[asyncio.ensure_future(self.open(target, request))] = target
+
+        start(self.primary)
+        try:
+            if self.secondary and self.hedge:
+                hedge_after = self.primary.latency.threshold()
+                done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+                if not done:
+                    self.count("hedged")
+                    tracer.annotate(hedged=True, hedge_after_ms=round(hedge_after * 1000, 1))
+                    start(self.secondary)
+
+            errors = []
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    tasks.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        await CloseStream(task.result().stream)
+
+                if winner:
+                    if winner.target is not self.primary:
+                        self.count("secondary_wins")
+                    if self.primary in tasks.values():
+                        # The primary is cancelled before its first chunk, it took at least this long.
+                        # Without the sample only fast responses are recorded and the hedge delay drifts down.
+                        self.primary.latency.add(max(time.perf_counter() - requested, hedge_after))
+                    tracer.annotate(target=winner.target.name)
+                    return winner
+
+                if self.secondary and self.secondary not in started:
+                    self.count("failovers")
+                    tracer.annotate(failover=True, primary_error=f"{type(errors[0]).__name__}: {errors[0]}")
+                    start(self.secondary)
+
+            raise errors[0]
+
+        finally:
+            # Cancel the loser, a loser that got its first chunk before the cancel still has a stream to close
+            for task in tasks:
+                task.cancel()
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(result, OpenStream):
+                    await CloseStream(result.stream)
+
+    async def stream_async(self, request):
+        """Yield the chunks of a streamed completion request under the policy"""
+        opened = await self.first_response(request)
+        try:
+            if opened.first is not None:
+                yield opened.first
+                async for chunk in opened.iterator:
+                    yield chunk
+        finally:
+            await CloseStream(opened.stream)
+
+    def stream(self, request):
+        """Blocking iterator version of stream_async for synchronous callers"""
+        return IterateAsync(self.stream_async(request))
+
+    def stats(self):
+        with self.lock:
+            counts = dict(self.counts)
+        counts["hedge_after_ms"] = round(self.primary.latency.threshold() * 1000, 1)
+        return counts
+
+# Global policy for the answer models, a smaller model on the same provider is the fallback
+llm_policy = RequestPolicy(
+    Target("groq", lambda: clients.async_groq),
+    Target("fallback", lambda: clients.async_groq, FallbackModel),
+)
@@ -0,0 +1,320 @@
+"""Headless service mode: the assistant's backends over a local HTTP/WebSocket API.
+
+    POST /classify   {"query"}                -> {"decision": [...]}
+    POST /chat       {"query", "stream"}      -> {"answer"} or streamed NDJSON events
+    POST /realtime   {"query", "stream"}      -> {"answer"} or streamed NDJSON events
+    POST /automation {"commands": [...]}      -> {"result"}
+    POST /advanced   {"command"}              -> {"result"}
+    POST /query      {"query", "stream"}      -> classify and run every part of the decision
+    GET  /image/{id}, DELETE /image/{id}      -> image job status / cancel
+    GET  /ws                                  -> the same operations as JSON messages,
+                                                 {"id", "type": "chat", "query"} etc.
+    GET  /health
+
+Streamed events are {"type": "delta", "text"} while an answer is generated,
+then {"type": "answer", "text"}; WebSocket events also carry the request id.
+
+Requests from a browser page on another origin are refused and POST bodies
+must be sent as application/json, so a web page cannot drive the API. The
+routes that run OS commands (/automation, /advanced, /ws and the command
+steps of /query) are only enabled when ServerToken is set.
+"""
+from Backend.Startup import LazyBackend
+from Backend.AsyncRuntime import RunAsync
+from Backend.Config import env_vars
+from Backend.Clients import clients
+from Backend.RequestPolicy import llm_policy
+from Backend.Dispatcher import PlanDecision, Dispatch
+from Backend.Utils import QueryModifier
+from aiohttp import web, WSMsgType
+from urllib.parse import urlparse
+import threading
+import asyncio
+import json
+
+ServerHost = env_vars.get("ServerHost", "127.0.0.1")
+ServerPort = int(env_vars.get("ServerPort", "8765"))
+ServerToken = env_vars.get("ServerToken")
+MaxConcurrentRequests = int(env_vars.get("MaxConcurrentRequests", "8"))
+
+LocalHosts = {"localhost", "127.0.0.1", "::1"}
+# Routes that can run OS commands, disabled without a token
+CommandRoutes = {"/automation", "/advanced", "/ws"}
+CommandsDisabled = "System commands are disabled, set ServerToken to enable them"
+
+def IsLocalOrigin(origin):
+    """True for requests without an Origin (not from a browser page) or from a page served locally"""
+    if origin is None:
+        return True
+    parsed = urlparse(origin)
+    return parsed.scheme in ("http", "https") and parsed.hostname in LocalHosts
+
+FirstLayerDMM = LazyBackend("Backend.Model", "FirstLayerDMM")
+ChatBot = LazyBackend("Backend.Chatbot", "ChatBot")
+RealtimeSearchEngine = LazyBackend("Backend.RealtimeSearchEngine", "RealtimeSearchEngine")
+PrefetchSearch = LazyBackend("Backend.RealtimeSearchEngine", "PrefetchSearch")
+Automation = LazyBackend("Backend.Automation", "Automation")
+ProcessAdvancedCommand = LazyBackend("Backend.AdvancedAutomation", "ProcessAdvancedCommand")
+image_worker = LazyBackend("Backend.ImageGeneration", "image_worker")
+
+class AssistantServer:
+    """aiohttp application serving the backends, running on the shared event loop"""
+
+    def __init__(self, host=ServerHost, port=ServerPort, token=ServerToken, max_concurrent=MaxConcurrentRequests):
+        self.host = host
+        self.port = port
+        self.token = token
+        self.limit = asyncio.Semaphore(max_concurrent)
+        self.in_flight = 0
+        self.runner = None
+
+        self.app = web.Application(middlewares=[self.auth_middleware])
+        self.app.add_routes([
+            web.get("/health", self.health),
+            web.post("/classify", self.classify),
+            web.post("/chat", self.chat),
+            web.post("/realtime", self.realtime),
+            web.post("/automation", self.automation),
+            web.post("/advanced", self.advanced),
+            web.post("/query", self.query),
+            web.get("/image/{job_id}", self.image_status),
+            web.delete("/image/{job_id}", self.image_cancel),
+            web.get("/ws", self.websocket),
+        ])
+
+    @web.middleware
+    async def auth_middleware(self, request, handler):
+        # Browsers send Origin on cross-site requests and WebSocket upgrades
+        if not IsLocalOrigin(request.headers.get("Origin")):
+            raise web.HTTPForbidden(text="Cross-origin requests are not allowed")
+        if not self.token and request.path in CommandRoutes:
+            raise web.HTTPForbidden(text=CommandsDisabled)
+        if self.token and request.path != "/health":
+            supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+            if supplied != self.token and request.query.get("token") != self.token:
+                raise web.HTTPUnauthorized(text="Invalid or missing token")
+        return await handler(request)
+
+    async def start(self):
+        self.runner = web.AppRunner(self.app)
+        await self.runner.setup()
+        await web.TCPSite(self.runner, self.host, self.port).start()
+        print(f"Assistant API listening on http://{self.host}:{self.port}")
+
+    async def stop(self):
+        if self.runner:
+            await self.runner.cleanup()
+
+    # Operations, shared by the HTTP and WebSocket front ends
+
+    async def run_blocking(self, func, *args, **kwargs):
+        """Run a blocking backend call in a worker thread under the concurrency limit"""
+        async with self.limit:
+            self.in_flight += 1
+            try:
+                return await asyncio.to_thread(func, *args, **kwargs)
+            finally:
+                self.in_flight -= 1
+
+    async def stream_answer(self, AnswerFunc, query):
+        """Yield delta events from a blocking answering backend, then the final answer"""
+        loop = asyncio.get_running_loop()
+        deltas = asyncio.Queue()
+
+        def on_token(text):
+            loop.call_soon_threadsafe(deltas.put_nowait, text)
+
+        task = asyncio.ensure_future(self.run_blocking(AnswerFunc, QueryModifier(query), on_token=on_token))
+        task.add_done_callback(lambda _: loop.call_soon_threadsafe(deltas.put_nowait, None))
+
+        while True:
+            text = await deltas.get()
+            if text is None:
+                break
+            yield {"type": "delta", "text": text}
+
+        yield {"type": "answer", "text": await task}
+
+    async def run_query(self, query):
+        """Classify a query and run every part of the decision concurrently, yielding events as they happen"""
+        # Start the search for a realtime-sounding query while it is classified
+        await asyncio.to_thread(PrefetchSearch, query)
+        decision = await self.run_blocking(FirstLayerDMM, query)
+        yield {"type": "decision", "decision": decision}
+
+        events = asyncio.Queue()
+
+        async def run_advanced(step):
+            if not self.token:
+                raise PermissionError(CommandsDisabled)
+            result = await ProcessAdvancedCommand(step.payload)
+            await events.put({"type": "advanced_system", "command": step.payload, "result": result})
+
+        async def run_automation(step):
+            if not self.token:
+                raise PermissionError(CommandsDisabled)
+            await events.put({"type": "automation", "commands": [step.payload], "result": await Automation([step.payload])})
+
+        async def run_image(step):
+            await events.put({"type": "image_job", "job_id": image_worker.submit(step.payload)})
+
+        async def run_answer(step):
+            realtime, answer_query = step.payload
+            async for event in self.stream_answer(RealtimeSearchEngine if realtime else ChatBot, answer_query):
+                await events.put(event)
+
+        def on_result(step, result):
+            if isinstance(result, Exception):
+                events.put_nowait({"type": "error", "step": step.kind, "error": str(result)})
+
+        handlers = {"advanced_system": run_advanced, "automation": run_automation, "image": run_image, "answer": run_answer}
+        task = asyncio.ensure_future(Dispatch(PlanDecision(decision), handlers, on_result))
+        task.add_done_callback(lambda _: events.put_nowait(None))
+
+        while True:
+            event = await events.get()
+            if event is None:
+                break
+            yield event
+        await task
+
+    async def run_operation(self, message):
+        """Yield the events for one operation described by a JSON message"""
+        kind = message.get("type")
+        if kind == "classify":
+            yield {"type": "decision", "decision": await self.run_blocking(FirstLayerDMM, message["query"])}
+        elif kind in ("chat", "realtime"):
+            AnswerFunc = ChatBot if kind == "chat" else RealtimeSearchEngine
+            async for event in self.stream_answer(AnswerFunc, message["query"]):
+                yield event
+        elif kind in ("automation", "advanced") and not self.token:
+            raise PermissionError(CommandsDisabled)
+        elif kind == "automation":
+            yield {"type": "automation", "result": await Automation(list(message["commands"]))}
+        elif kind == "advanced":
+            yield {"type": "advanced_system", "result": await ProcessAdvancedCommand(message["command"])}
+        elif kind == "query":
+            async for event in self.run_query(message["query"]):
+                yield event
+        else:
+            raise ValueError(f"Unknown operation: {kind}")
+
+    # HTTP handlers
+
+    async def respond(self, request, kind):
+        """Answer a POST either as one JSON document or as streamed NDJSON events"""
+        # A cross-site form or no-cors fetch cannot send this content type without a preflight
+        if request.content_type != "application/json":
+            raise web.HTTPUnsupportedMediaType(text="Content-Type must be application/json")
+        try:
+            message = await request.json()
+        except json.JSONDecodeError:
+            raise web.HTTPBadRequest(text="Body must be JSON")
+        message["type"] = kind
+
+        if not message.get("stream"):
+            events = []
+            try:
+                async for event in self.run_operation(message):
+                    if event["type"] != "delta":
+                        events.append(event)
+            except (KeyError, ValueError) as e:
+                raise web.HTTPBadRequest(text=f"Bad request: {e}")
+            return web.json_response(events[0] if len(events) == 1 else {"events": events})
+
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        try:
+            async for event in self.run_operation(message):
+                await response.write((json.dumps(event) + "\n").encode("utf-8"))
+        except Exception as e:
+            await response.write((json.dumps({"type": "error", "error": str(e)}) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    async def health(self, request):
+        return web.json_response({"status": "ok", "in_flight": self.in_flight, "llm": clients.stats(), "policy": llm_policy.stats()})
+
+    async def classify(self, request):
+        return await self.respond(request, "classify")
+
+    async def chat(self, request):
+        return await self.respond(request, "chat")
+
+    async def realtime(self, request):
+        return await self.respond(request, "realtime")
+
+    async def automation(self, request):
+        return await self.respond(request, "automation")
+
+    async def advanced(self, request):
+        return await self.respond(request, "advanced")
+
+    async def query(self, request):
+        return await self.respond(request, "query")
+
+    async def image_status(self, request):
+        status = image_worker.status(request.match_info["job_id"])
+        if status is None:
+            raise web.HTTPNotFound(text="Unknown job")
+        return web.json_response(status)
+
+    async def image_cancel(self, request):
+        return web.json_response({"cancelled": image_worker.cancel(request.match_info["job_id"])})
+
+    # WebSocket handler
+
+    async def websocket(self, request):
+        """Each message starts its own task, so one socket can carry many requests at once"""
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        send_lock = asyncio.Lock()
+        tasks = set()
+
+        async def send(payload):
+            async with send_lock:
+                if not ws.closed:
+                    await ws.send_json(payload)
+
+        async def handle(message):
+            request_id = message.get("id")
+            try:
+                async for event in self.run_operation(message):
+                    await send({"id": request_id, **event})
+                await send({"id": request_id, "type": "done"})
+            except Exception as e:
+                await send({"id": request_id, "type": "error", "error": str(e)})
+
+        async for msg in ws:
+            if msg.type != WSMsgType.TEXT:
+                continue
+            try:
+                message = json.loads(msg.data)
+            except json.JSONDecodeError:
+                await send({"type": "error", "error": "Message must be JSON"})
+                continue
+            task = asyncio.ensure_future(handle(message))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        for task in tasks:
+            task.cancel()
+        return ws
+
+def RunServer(host=ServerHost, port=ServerPort):
+    """Start the API on the shared runtime and block until interrupted"""
+    async def create():
+        server = AssistantServer(host, port)
+        await server.start()
+        return server
+
+    server = RunAsync(create())
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        print("Shutting down assistant API...")
+    finally:
+        RunAsync(server.stop())
+
+if __name__ == "__main__":
+    RunServer()
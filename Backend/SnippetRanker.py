@@ -0,0 +1,98 @@
+"""Local ranking of search text for realtime prompts.
+
+Search descriptions and page extracts are scored against the query with
+BM25, near duplicates and boilerplate are dropped, and the best passages
+are kept up to a token budget, so the realtime prompt carries only the
+text that is likely to answer the question.
+"""
+from Backend.Cache import FillerWords
+from Backend.Utils import EstimateTokens
+from collections import Counter
+import math
+import re
+
+StopWords = FillerWords | {"is", "are", "was", "were", "be", "been", "what", "who", "when", "where", "how", "why",
+                           "which", "of", "in", "on", "at", "for", "to", "and", "or", "about", "me", "tell", "do",
+                           "does", "did", "i", "you", "it", "this", "that", "with", "by", "from", "as", "s"}
+WordPattern = re.compile(r"[a-z0-9]+")
+
+# Site chrome that slips through extraction: cookie banners, newsletter and sharing prompts
+BoilerplatePattern = re.compile(
+    r"\b(cookies?|subscribe|newsletter|sign up|sign in|log in|all rights reserved|privacy policy|"
+    r"terms of (use|service)|advertisement|click here|enable javascript|share (this|on))\b"
+)
+BoilerplateMaxWords = 30
+
+def Terms(text):
+    return [word for word in WordPattern.findall(text.lower()) if word not in StopWords]
+
+def IsBoilerplate(text):
+    """Short passages mentioning site chrome; long ones only mention it in passing"""
+    return len(text.split()) < BoilerplateMaxWords and BoilerplatePattern.search(text.lower()) is not None
+
+class BM25:
+    """Okapi BM25 scores of a query against a small set of passages"""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = [Counter(Terms(document)) for document in documents]
+        self.lengths = [sum(document.values()) for document in self.documents]
+        self.average = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        frequencies = Counter(term for document in self.documents for term in document)
+        count = len(self.documents)
+        self.idf = {term: math.log(1 + (count - df + 0.5) / (df + 0.5)) for term, df in frequencies.items()}
+
+    def scores(self, query):
+        terms = set(Terms(query))
+        scores = []
+        for document, length in zip(self.documents, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / self.average) if self.average else self.k1
+            for term in terms:
+                tf = document.get(term)
+                if tf:
+                    score += self.idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            scores.append(score)
+        return scores
+
+def Similarity(a, b):
+    """Jaccard similarity of two term sets"""
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+def RankPassages(query, passages, budget=None, limit=None, duplicate=0.8):
+    """The best passages for a query, best first, each with a "score" added.
+
+    passages are dicts with a "text" key. Boilerplate and passages nearly the
+    same as a better one are dropped, and so are passages matching no query
+    term while others do. With a budget, passages are added while their
+    estimated tokens fit.
+    """
+    candidates = [passage for passage in passages if passage["text"].strip() and not IsBoilerplate(passage["text"])]
+    if not candidates:
+        return []
+
+    scores = BM25([passage["text"] for passage in candidates]).scores(query)
+    relevant = any(scores)
+    # Stable sort keeps search order between equal scores
+    order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+
+    selected = []
+    kept_terms = []
+    used = 0
+    for i in order:
+        if relevant and not scores[i]:
+            break
+        passage = candidates[i]
+        terms = set(Terms(passage["text"]))
+        if any(Similarity(terms, other) >= duplicate for other in kept_terms):
+            continue
+        tokens = EstimateTokens(passage["text"])
+        if budget is not None and used + tokens > budget:
+            continue
+        selected.append(dict(passage, score=round(scores[i], 3)))
+        kept_terms.append(terms)
+        used += tokens
+        if limit and len(selected) >= limit:
+            break
+    return selected
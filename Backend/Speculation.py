@@ -0,0 +1,131 @@
+from Backend.Tracing import InThreadContext
+import threading
+import json
+import time
+import os
+
+class SpeculativeAnswer:
+    """Start a general answer before the decision model has classified the query.
+
+    Tokens are buffered until the caller either adopts the answer with answer()
+    or throws it away with cancel(). Nothing is written to the chat log unless
+    the answer is adopted.
+    """
+
+    def __init__(self, AnswerFunc, Query, SaveFunc):
+        self.answer_func = AnswerFunc
+        self.save_func = SaveFunc
+        self.query = Query
+        self.tokens = []
+        self.sink = None
+        self.result = None
+        self.error = None
+        self.started = time.perf_counter()
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+
+        self.thread = threading.Thread(target=InThreadContext(self._run), daemon=True)
+        self.thread.start()
+
+    def _run(self):
+        try:
+            self.result = self.answer_func(
+                self.query, on_token=self._on_token, cancel_event=self.cancelled, persist=False
+            )
+        except Exception as e:
+            self.error = e
+        finally:
+            self.done.set()
+
+    def _on_token(self, text):
+        with self.lock:
+            self.tokens.append(text)
+            if self.sink:
+                self.sink(text)
+
+    def answer(self, Query=None, on_token=None):
+        """Adopt the speculative answer, replaying buffered tokens into on_token.
+
+        Has the same call shape as ChatBot so it can be handed to AnswerAndSpeak.
+        """
+        with self.lock:
+            if on_token:
+                for text in self.tokens:
+                    on_token(text)
+            self.sink = on_token
+
+        self.done.wait()
+        if self.error:
+            raise self.error
+
+        # Only a streamed answer is a real one, error messages are not logged
+        if self.tokens:
+            self.save_func(self.query, self.result)
+        return self.result
+
+    def cancel(self):
+        """Abandon the speculative answer"""
+        self.cancelled.set()
+
+class SpeculationStats:
+    """Hit/miss counters for speculative answering, kept under Data/"""
+
+    def __init__(self, path=r"Data\Speculation.json"):
+        self.path = path
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            self.hits = data.get("hits", 0)
+            self.misses = data.get("misses", 0)
+            self.saved_seconds = data.get("saved_seconds", 0.0)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(self.path, "w") as f:
+            json.dump(self.summary(), f, indent=4)
+
+    def record(self, hit, saved_seconds=0.0):
+        """Record one speculation outcome; saved_seconds is the classification time overlapped on a hit"""
+        with self.lock:
+            if hit:
+                self.hits += 1
+                self.saved_seconds += saved_seconds
+            else:
+                self.misses += 1
+            try:
+                self.save()
+            except Exception as e:
+                print(f"Error saving speculation stats: {e}")
+
+    @property
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def summary(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 3),
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+def IsGeneralOnly(Decision):
+    """True when the decision is a single general query, the case speculation bets on"""
+    return len(Decision) == 1 and Decision[0].startswith("general")
+
+# Global speculation statistics
+speculation_stats = SpeculationStats()
+
+if __name__ == "__main__":
+    print(speculation_stats.summary())
@@ -0,0 +1,97 @@
+import importlib
+import threading
+import time
+
+class StartupTimer:
+    """Collects startup milestones and warm-up durations for a timing report"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.milestones = []
+        self.durations = []
+        self.lock = threading.Lock()
+
+    def mark(self, name):
+        """Record a milestone as an offset from process start"""
+        with self.lock:
+            self.milestones.append((name, (time.perf_counter() - self.start) * 1000))
+
+    def record(self, name, seconds):
+        """Record how long a single step took"""
+        with self.lock:
+            self.durations.append((name, seconds * 1000))
+
+    def report(self):
+        with self.lock:
+            lines = ["Startup timing:"]
+            lines += [f"  {name:<40}{offset:>10.1f} ms after start" for name, offset in self.milestones]
+            lines += [f"  {name:<40}{took:>10.1f} ms" for name, took in self.durations]
+        return "\n".join(lines)
+
+# Global startup timer, created when Main first imports this module
+startup_timer = StartupTimer()
+
+class LazyBackend:
+    """Stand-in for a backend function or object whose module is imported on first use.
+
+    Calls and attribute lookups are forwarded to the real attribute, resolved
+    on every access so patched module attributes are always honoured.
+    """
+
+    def __init__(self, module_name, attr):
+        self.module_name = module_name
+        self.attr = attr
+        self.module = None
+        self.lock = threading.Lock()
+
+    def load(self):
+        if self.module is None:
+            with self.lock:
+                if self.module is None:
+                    started = time.perf_counter()
+                    module = importlib.import_module(self.module_name)
+                    startup_timer.record(f"import {self.module_name}", time.perf_counter() - started)
+                    self.module = module
+        return self.module
+
+    @property
+    def loaded(self):
+        return self.module is not None
+
+    def get(self):
+        return getattr(self.load(), self.attr)
+
+    def __call__(self, *args, **kwargs):
+        return self.get()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+def WarmUp(backends, hooks=(), on_done=None):
+    """Import backends and run warm-up hooks on a background thread.
+
+    Each hook is a (name, callable) pair, e.g. microphone calibration. A
+    failing step is reported and skipped so the rest still warm up.
+    """
+    def run():
+        for backend in backends:
+            try:
+                backend.load()
+            except Exception as e:
+                print(f"Error warming up {backend.module_name}: {e}")
+
+        for name, hook in hooks:
+            started = time.perf_counter()
+            try:
+                hook()
+            except Exception as e:
+                print(f"Error in warm-up step {name}: {e}")
+            startup_timer.record(name, time.perf_counter() - started)
+
+        startup_timer.mark("warm-up complete")
+        if on_done:
+            on_done()
+
+    thread = threading.Thread(target=run, name="WarmUp", daemon=True)
+    thread.start()
+    return thread
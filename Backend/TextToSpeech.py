@@ -1,13 +1,55 @@
 import pygame
 import random
-import asyncio
 import edge_tts
+import threading
+import queue
+import re
+import io
 import os
-from dotenv import dotenv_values
+from Backend.Config import env_vars
+from Backend.AsyncRuntime import RunAsync
+from Backend.Tracing import tracer, traced, InThreadContext
 
-env_vars = dotenv_values(".env")
 AssistantVoice = env_vars.get("AssistantVoice")
 
+# Sentence boundary: terminal punctuation followed by whitespace
+SentenceBoundary = re.compile(r'(?<=[.!?])\s+')
+MinSentenceLength = 12
+SpokenSentenceLimit = 2
+
+responses = [
+    "The rest of the result has been printed to the chat screen, kindly check it out sir.",
+    "The rest of the text is now on the chat screen, sir, please check it.",
+    "You can see the rest of the text on the chat screen, sir.",
+    "The remaining part of the text is now on the chat screen, sir.",
+    "Sir, you'll find more text on the chat screen for you to see.",
+    "The rest of the answer is now on the chat screen, sir.",
+    "Sir, please look at the chat screen, the rest of the answer is there.",
+    "You'll find the complete answer on the chat screen, sir.",
+    "The next part of the text is on the chat screen, sir.",
+    "Sir, please check the chat screen for more information.",
+    "There's more text on the chat screen for you, sir.",
+    "Sir, take a look at the chat screen for additional text.",
+    "You'll find more to read on the chat screen, sir.",
+    "Sir, check the chat screen for the rest of the text.",
+    "The chat screen has the rest of the text, sir.",
+    "There's more to see on the chat screen, sir, please look.",
+    "Sir, the chat screen holds the continuation of the text.",
+    "You'll find the complete answer on the chat screen, kindly check it out sir.",
+    "Please review the chat screen for the rest of the text, sir.",
+    "Sir, look at the chat screen for the complete answer."
+]
+
+# Held while audio plays so concurrent answers are spoken one after another
+PlaybackLock = threading.Lock()
+# Synthesis or playback attempts per utterance, e.g. edge-tts fails while offline
+TTSAttempts = 3
+
+def IsLongAnswer(Text):
+    """Long answers are only partly spoken, the rest stays on the chat screen"""
+    return len(str(Text).split(".")) > 4 and len(Text) >= 250
+
+@traced("tts.synthesis")
 async def TextToAudioFile(text) -> None:
     file_path = r"Data\speech.mp3"
 
@@ -18,64 +60,200 @@ async def TextToAudioFile(text) -> None:
     await communicate.save(r"Data\speech.mp3")
 
 def TTS(Text, func=lambda r=None: True):
-    while True:
-        try:
-            asyncio.run(TextToAudioFile(Text))
-
-            pygame.mixer.init()
+    # The mixer and Data\speech.mp3 are shared, one utterance plays at a time
+    with PlaybackLock:
+        for attempt in range(TTSAttempts):
+            try:
+                RunAsync(TextToAudioFile(Text))
 
-            pygame.mixer.music.load(r"Data\speech.mp3")
-            pygame.mixer.music.play()
+                with tracer.span("tts.playback"):
+                    pygame.mixer.init()
 
-            clock = pygame.time.Clock()
+                    pygame.mixer.music.load(r"Data\speech.mp3")
+                    pygame.mixer.music.play()
 
-            while pygame.mixer.music.get_busy():
-                if not func():
-                    break
-                clock.tick(10)
+                    clock = pygame.time.Clock()
 
-            return True
-        except Exception as e:
-            print(f"Error in TTS : {e}")
+                    while pygame.mixer.music.get_busy():
+                        if not func():
+                            break
+                        clock.tick(10)
 
-        finally:
-            try:
-                func(False)
-                pygame.mixer.music.stop()
-                pygame.mixer.quit()
+                return True
             except Exception as e:
-                print(f"Error in finally block: {e}")
+                print(f"Error in TTS : {e}")
+
+            finally:
+                try:
+                    func(False)
+                    pygame.mixer.music.stop()
+                    pygame.mixer.quit()
+                except Exception as e:
+                    print(f"Error in finally block: {e}")
+        return False
 
 def TextToSpeech(Text, func=lambda r=None: True):
-    Data = str(Text).split(".")
-
-    responses = [
-        "The rest of the result has been printed to the chat screen, kindly check it out sir.",
-        "The rest of the text is now on the chat screen, sir, please check it.",
-        "You can see the rest of the text on the chat screen, sir.",
-        "The remaining part of the text is now on the chat screen, sir.",
-        "Sir, you'll find more text on the chat screen for you to see.",
-        "The rest of the answer is now on the chat screen, sir.",
-        "Sir, please look at the chat screen, the rest of the answer is there.",
-        "You'll find the complete answer on the chat screen, sir.",
-        "The next part of the text is on the chat screen, sir.",
-        "Sir, please check the chat screen for more information.",
-        "There's more text on the chat screen for you, sir.",
-        "Sir, take a look at the chat screen for additional text.",
-        "You'll find more to read on the chat screen, sir.",
-        "Sir, check the chat screen for the rest of the text.",
-        "The chat screen has the rest of the text, sir.",
-        "There's more to see on the chat screen, sir, please look.",
-        "Sir, the chat screen holds the continuation of the text.",
-        "You'll find the complete answer on the chat screen, kindly check it out sir.",
-        "Please review the chat screen for the rest of the text, sir.",
-        "Sir, look at the chat screen for the complete answer."
-    ]
-
-    if len(Data) > 4 and len(Text) >= 250:
+    if IsLongAnswer(Text):
         TTS(" ".join(Text.split(".")[0:2]) + "." + random.choice(responses), func)
     else:
         TTS(Text, func)
+
+
+@traced("tts.synthesis")
+async def TextToAudioBytes(text) -> bytes:
+    """Synthesize text into mp3 bytes in memory"""
+    communicate = edge_tts.Communicate(text, AssistantVoice, pitch='+5Hz', rate='+13%')
+    audio = bytearray()
+
+    async for chunk in communicate.stream():
+        if chunk["type"] == "audio":
+            audio.extend(chunk["data"])
+
+    return bytes(audio)
+
+@traced("tts.playback")
+def PlayAudio(audio, func=lambda r=None: True):
+    """Play mp3 bytes through an initialised mixer, returns False if interrupted"""
+    pygame.mixer.music.load(io.BytesIO(audio), "mp3")
+    pygame.mixer.music.play()
+
+    clock = pygame.time.Clock()
+
+    while pygame.mixer.music.get_busy():
+        if not func():
+            pygame.mixer.music.stop()
+            return False
+        clock.tick(10)
+
+    return True
+
+class SentenceSplitter:
+    """Accumulate streamed text and release it one complete sentence at a time"""
+
+    def __init__(self):
+        self.buffer = ""
+
+    def feed(self, text):
+        self.buffer += text
+        parts = SentenceBoundary.split(self.buffer)
+        self.buffer = parts.pop()
+
+        sentences = []
+        pending = ""
+        for part in parts:
+            pending = f"{pending} {part}" if pending else part
+            # Merge very short fragments ("Yes.", "Dr.") into the next sentence
+            if len(pending) >= MinSentenceLength:
+                sentences.append(pending.strip())
+                pending = ""
+
+        if pending:
+            self.buffer = f"{pending} {self.buffer}"
+        return sentences
+
+    def flush(self):
+        remainder = self.buffer.strip()
+        self.buffer = ""
+        return remainder
+
+class StreamingTextToSpeech:
+    """Speak an answer while it is still being generated.
+
+    Text deltas go through feed(), complete sentences are synthesized on one
+    thread and played back in order on another, so the first sentence is heard
+    while the model is still producing the rest.
+    """
+
+    def __init__(self, func=lambda r=None: True):
+        self.func = func
+        self.splitter = SentenceSplitter()
+        self.text = ""
+        self.spoken = 0
+        self.held = []
+        self.truncated = False
+        self.stopped = threading.Event()
+        self.sentence_queue = queue.Queue()
+        self.audio_queue = queue.Queue()
+
+        self.synth_thread = threading.Thread(target=InThreadContext(self._synthesize), daemon=True)
+        self.playback_thread = threading.Thread(target=InThreadContext(self._playback), daemon=True)
+        self.synth_thread.start()
+        self.playback_thread.start()
+
+    def feed(self, text):
+        """Add a text delta from the model"""
+        if not text or self.truncated:
+            return
+
+        self.text += text
+        for sentence in self.splitter.feed(text):
+            self._queue_sentence(sentence)
+
+        # Same rule as TextToSpeech: long answers stop after the first sentences
+        if IsLongAnswer(self.text):
+            self.held.clear()
+            self.truncated = True
+
+    def _queue_sentence(self, sentence):
+        if self.spoken < SpokenSentenceLimit:
+            self.sentence_queue.put(sentence)
+            self.spoken += 1
+        else:
+            self.held.append(sentence)
+
+    def finish(self):
+        """Mark the end of the answer, speaking whatever is left"""
+        if self.truncated:
+            self.sentence_queue.put(random.choice(responses))
+        else:
+            remainder = self.splitter.flush()
+            for sentence in self.held + ([remainder] if remainder else []):
+                self.sentence_queue.put(sentence)
+            self.held.clear()
+        self.sentence_queue.put(None)
+
+    def wait(self):
+        """Block until playback is done"""
+        self.playback_thread.join()
+
+    def stop(self):
+        """Abandon synthesis and playback"""
+        self.stopped.set()
+        self.sentence_queue.put(None)
+
+    def _synthesize(self):
+        while not self.stopped.is_set():
+            sentence = self.sentence_queue.get()
+            if sentence is None:
+                break
+            try:
+                self.audio_queue.put(RunAsync(TextToAudioBytes(sentence)))
+            except Exception as e:
+                print(f"Error in streaming TTS synthesis : {e}")
+        self.audio_queue.put(None)
+
+    def _playback(self):
+        with PlaybackLock:
+            try:
+                pygame.mixer.init()
+                while not self.stopped.is_set():
+                    audio = self.audio_queue.get()
+                    if audio is None:
+                        break
+                    if not audio:
+                        continue
+                    if not PlayAudio(audio, self.func):
+                        self.stop()
+            except Exception as e:
+                print(f"Error in streaming TTS playback : {e}")
+            finally:
+                try:
+                    self.func(False)
+                    pygame.mixer.music.stop()
+                    pygame.mixer.quit()
+                except Exception as e:
+                    print(f"Error in finally block: {e}")
+
 # jar tumhala purna read karaich lavaich asel tr TTS cha use kara jar 4 or tya peksha line 
 # jast lines text asel tr TTS use kra ani Short made read karacih asel tr texttosppech use kara  
 if __name__ == "__main__":
@@ -0,0 +1,172 @@
+from contextlib import contextmanager
+from Backend.Config import env_vars
+import contextvars
+import functools
+import threading
+import inspect
+import json
+import time
+import uuid
+import sys
+import os
+
+TracingEnabled = env_vars.get("Tracing", "True").lower() == "true"
+TracePath = r"Data\Traces.jsonl"
+
+current_trace = contextvars.ContextVar("current_trace", default=None)
+current_span = contextvars.ContextVar("current_span", default=None)
+
+class Span:
+    """One timed stage of a turn, attributes can be added while it is open"""
+
+    def __init__(self, name, trace_id, parent_id, attrs):
+        self.name = name
+        self.id = uuid.uuid4().hex[:12]
+        self.trace_id = trace_id
+        self.parent_id = parent_id
+        self.attrs = dict(attrs)
+        self.started = time.time()
+        self.start = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def mark(self, event):
+        """Record the offset of an event inside the span (e.g. first_token) once"""
+        self.attrs.setdefault(f"{event}_ms", round((time.perf_counter() - self.start) * 1000, 3))
+
+    def to_dict(self, error=None):
+        record = {
+            "trace": self.trace_id,
+            "span": self.id,
+            "parent": self.parent_id,
+            "name": self.name,
+            "start": self.started,
+            "duration_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "attrs": self.attrs,
+        }
+        if error:
+            record["error"] = error
+        return record
+
+class Tracer:
+    """Per-turn latency tracer writing one JSON line per finished span"""
+
+    def __init__(self, path=TracePath, enabled=TracingEnabled):
+        self.path = path
+        self.enabled = enabled
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def trace(self, name="turn", **attrs):
+        """Start a new trace with a root span, nested spans attach to it"""
+        token = current_trace.set(uuid.uuid4().hex[:12])
+        try:
+            with self.span(name, **attrs) as span:
+                yield span
+        finally:
+            current_trace.reset(token)
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """Time a stage, spans opened outside a trace get a trace of their own"""
+        trace_id = current_trace.get() or uuid.uuid4().hex[:12]
+        parent = current_span.get()
+        span = Span(name, trace_id, parent.id if parent else None, attrs)
+        token = current_span.set(span)
+        error = None
+        try:
+            yield span
+        except BaseException as e:
+            error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            try:
+                current_span.reset(token)
+            except ValueError:
+                # A generator holding the span was closed from another context
+                pass
+            self.write(span.to_dict(error))
+
+    def annotate(self, **attrs):
+        """Add attributes to the innermost open span"""
+        span = current_span.get()
+        if span:
+            span.set(**attrs)
+
+    def write(self, record):
+        if not self.enabled:
+            return
+        try:
+            with self.lock:
+                os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+                with open(self.path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(record) + "\n")
+        except Exception as e:
+            print(f"Error writing trace: {e}")
+
+# Global tracer
+tracer = Tracer()
+
+def traced(name, new_trace=False):
+    """Decorator that wraps a sync or async function in a span, or in a fresh trace with new_trace"""
+    def decorator(func):
+        def open_span():
+            return tracer.trace(name) if new_trace else tracer.span(name)
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with open_span():
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with open_span():
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def InThreadContext(func):
+    """Bind func to the caller's trace context so spans from a new thread join the current trace"""
+    context = contextvars.copy_context()
+    return functools.partial(context.run, func)
+
+def Percentile(values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not values:
+        return 0.0
+    rank = max(1, int(-(-percent * len(values) // 100)))
+    return values[min(rank, len(values)) - 1]
+
+def StageSummary(path=TracePath):
+    """Collect span durations per stage name from a trace file"""
+    stages = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            stages.setdefault(record["name"], []).append(record["duration_ms"])
+
+    summary = {}
+    for name, durations in stages.items():
+        durations.sort()
+        summary[name] = {
+            "count": len(durations),
+            "p50": Percentile(durations, 50),
+            "p95": Percentile(durations, 95),
+            "p99": Percentile(durations, 99),
+        }
+    return summary
+
+def PrintStageSummary(path=TracePath):
+    summary = StageSummary(path)
+    print(f"{'stage':<24}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}")
+    for name, stats in sorted(summary.items(), key=lambda item: -item[1]["p50"]):
+        print(f"{name:<24}{stats['count']:>8}{stats['p50']:>12.1f}{stats['p95']:>12.1f}{stats['p99']:>12.1f}")
+
+if __name__ == "__main__":
+    PrintStageSummary(sys.argv[1] if len(sys.argv) > 1 else TracePath)
@@ -20,4 +20,61 @@ def QueryModifier(Query):
         else:
             new_query += '.'
 
-    return new_query.capitalize()
\ No newline at end of file
+    return new_query.capitalize()
+
+def EstimateTokens(*texts):
+    """Rough token count for English prompts, about four characters per token"""
+    return sum(len(text) for text in texts) // 4 + 1
+
+class StreamingAnswerModifier:
+    """AnswerModifier applied incrementally to streamed text.
+
+    feed() takes raw deltas and returns cleaned text: "</s>" markers removed
+    (also when split across deltas), lines stripped and blank lines dropped.
+    Whitespace that may turn out to end a line is held back until it is known.
+    The pieces joined equal AnswerModifier of the whole text without "</s>".
+    """
+
+    Marker = "</s>"
+
+    def __init__(self):
+        self.pending = ""
+        self.space = ""
+        self.line_started = False
+        self.emitted = False
+
+    def feed(self, text):
+        text = (self.pending + text).replace(self.Marker, "")
+        self.pending = ""
+        # Hold back a possible start of a marker until the next delta
+        for size in range(len(self.Marker) - 1, 0, -1):
+            if text.endswith(self.Marker[:size]):
+                self.pending = text[-size:]
+                text = text[:-size]
+                break
+        return self.clean(text)
+
+    def flush(self):
+        text, self.pending = self.pending, ""
+        return self.clean(text)
+
+    def clean(self, text):
+        out = []
+        for char in text:
+            if char == "\n":
+                self.space = ""
+                self.line_started = False
+            elif char.isspace():
+                if self.line_started:
+                    self.space += char
+            else:
+                if not self.line_started:
+                    if self.emitted:
+                        out.append("\n")
+                    self.line_started = True
+                elif self.space:
+                    out.append(self.space)
+                self.space = ""
+                out.append(char)
+                self.emitted = True
+        return "".join(out)
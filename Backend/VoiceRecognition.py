@@ -3,11 +3,11 @@ import pyaudio
 import threading
 import queue
 import time
-from dotenv import dotenv_values
+from Backend.Config import env_vars
 from Backend.Utils import QueryModifier
+from Backend.Tracing import traced
 import mtranslate as mt
 
-env_vars = dotenv_values(".env")
 InputLanguage = env_vars.get("InputLanguage", "en")
 
 class VoiceRecognizer:
@@ -71,8 +71,9 @@ class VoiceRecognizer:
             self.stop_listening(wait_for_stop=False)
             self.is_listening = False
     
-    def listen_once(self, timeout=5):
-        """Listen for a single command with timeout"""
+    def listen_once(self, timeout=5, on_transcript=None):
+        """Listen for a single command with timeout.
+        on_transcript is called with the final transcript as soon as it is recognized."""
         try:
             with self.microphone as source:
                 print("Listening...")
@@ -85,7 +86,9 @@ class VoiceRecognizer:
             if not InputLanguage.lower().startswith("en"):
                 text = mt.translate(text, "en", "auto")
             
-            return QueryModifier(text)
+            text = QueryModifier(text)
+            NotifyTranscript(on_transcript, text)
+            return text
             
         except sr.WaitTimeoutError:
             return None
@@ -95,15 +98,35 @@ class VoiceRecognizer:
             print(f"Speech recognition error: {e}")
             return None
 
-# Global voice recognizer instance
-voice_recognizer = VoiceRecognizer()
+# Global voice recognizer instance, created on first use because
+# opening the microphone and calibrating for noise takes about a second
+voice_recognizer = None
+voice_recognizer_lock = threading.Lock()
 
-def SpeechRecognition(gui_update_queue=None):
-    """Main speech recognition function"""
+def GetVoiceRecognizer():
+    """Return the shared recognizer, creating and calibrating it on first call"""
+    global voice_recognizer
+    with voice_recognizer_lock:
+        if voice_recognizer is None:
+            voice_recognizer = VoiceRecognizer()
+    return voice_recognizer
+
+def NotifyTranscript(on_transcript, text):
+    """Hand a final transcript to a listener, a failing listener never loses the transcript"""
+    if on_transcript:
+        try:
+            on_transcript(text)
+        except Exception as e:
+            print(f"Error in transcript listener: {e}")
+
+@traced("stt")
+def SpeechRecognition(gui_update_queue=None, on_transcript=None):
+    """Main speech recognition function.
+    on_transcript receives the final transcript before it is returned, e.g. to start work on it early."""
     if gui_update_queue:
         gui_update_queue.put(('status', "Listening..."))
     
-    result = voice_recognizer.listen_once()
+    result = GetVoiceRecognizer().listen_once(on_transcript=on_transcript)
     
     if gui_update_queue and result:
         gui_update_queue.put(('status', "Processing..."))
@@ -0,0 +1,279 @@
+"""Local stand-ins for the network services used by the assistant.
+
+Each fake mimics the part of the client API the backends call, with
+configurable latency and token rates, so a full turn can be replayed with
+no network and no API keys. The Groq fakes can also inject 429 responses
+and a slow first-token tail to exercise Backend.RequestPolicy.
+"""
+from types import SimpleNamespace
+from urllib.parse import urlparse, parse_qs, quote
+import asyncio
+import base64
+import random
+import json
+import time
+
+class LatencyModel:
+    """Latency settings shared by the fakes; scale=0 makes every fake instantaneous"""
+
+    def __init__(self, scale=1.0, classify=0.8, first_token=0.35, tokens_per_second=250.0,
+                 search=0.9, page=0.4, slow_page=0.1, synthesis=0.25, playback_chars_per_second=400.0, image=2.0, automation=0.2,
+                 rate_limit=0.0, slow_tail=0.0, slow_factor=8.0, retry_after=0.5):
+        self.scale = scale
+        self.classify = classify
+        self.first_token = first_token
+        self.tokens_per_second = tokens_per_second
+        self.search = search
+        self.page = page
+        self.slow_page = slow_page  # chance a result page takes ten times longer, past the fetch deadline
+        self.synthesis = synthesis
+        self.playback_chars_per_second = playback_chars_per_second
+        self.image = image
+        self.automation = automation
+        self.rate_limit = rate_limit  # chance a completion is refused with a 429
+        self.slow_tail = slow_tail  # chance a completion's first token is slow_factor times later
+        self.slow_factor = slow_factor
+        self.retry_after = retry_after
+
+    def sleep(self, seconds):
+        if self.scale and seconds > 0:
+            time.sleep(seconds * self.scale)
+
+    async def async_sleep(self, seconds):
+        if self.scale and seconds > 0:
+            await asyncio.sleep(seconds * self.scale)
+
+ANSWER_WORDS = (
+    "The answer draws on well known facts. It is explained in a few short sentences. "
+    "Each sentence adds a little more detail to the overall picture. "
+    "Finally the reply wraps up with a brief summary of the main points."
+).split(" ")
+
+class FakeCohereClient:
+    """Stand-in for cohere.Client, answering chat() with the recorded decision"""
+
+    def __init__(self, latency, decisions):
+        self.latency = latency
+        self.decisions = decisions
+        self.calls = 0
+        self.prompt_chars = []
+
+    def chat(self, message="", preamble="", chat_history=(), **kwargs):
+        self.calls += 1
+        self.prompt_chars.append(len(preamble) + len(message) + sum(len(turn["message"]) for turn in chat_history))
+        self.latency.sleep(self.latency.classify)
+        decision = self.decisions.get(message, f"general {message}")
+        return [SimpleNamespace(event_type="text-generation", text=decision)]
+
+class FakeAsyncCohereClient:
+    """Stand-in for cohere.AsyncClient, sharing decisions and counters with a FakeCohereClient"""
+
+    def __init__(self, client):
+        self.client = client
+
+    async def chat(self, message="", preamble="", chat_history=(), **kwargs):
+        self.client.calls += 1
+        self.client.prompt_chars.append(len(preamble) + len(message) + sum(len(turn["message"]) for turn in chat_history))
+        await self.client.latency.async_sleep(self.client.latency.classify)
+        return SimpleNamespace(text=self.client.decisions.get(message, f"general {message}"))
+
+class FakeRateLimitError(Exception):
+    """Mimics groq.RateLimitError: a 429 status and a response carrying rate-limit headers"""
+
+    status_code = 429
+
+    def __init__(self, retry_after):
+        super().__init__("Error code: 429 - Rate limit reached")
+        headers = {"retry-after": f"{retry_after:.3f}", "x-ratelimit-remaining-requests": "0"}
+        self.response = FakeResponse(b'{"error": {"message": "Rate limit reached"}}', 429, headers)
+
+class _FakeCompletions:
+    def __init__(self, client):
+        self.client = client
+
+    def create(self, model=None, messages=None, stream=False, **kwargs):
+        self.client.calls += 1
+        self.client.prompt_chars.append(sum(len(m.get("content", "")) for m in messages or []))
+        first_token = self.client.inject()
+        tokens = self.client.answer_tokens()
+
+        if not stream:
+            self.client.latency.sleep(first_token)
+            content = "".join(tokens)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        return self.client.stream(tokens, first_token)
+
+class FakeGroqClient:
+    """Stand-in for groq.Groq streaming a canned answer at a fixed token rate"""
+
+    def __init__(self, latency, answer_words=ANSWER_WORDS):
+        self.latency = latency
+        self.answer_words = answer_words
+        self.calls = 0
+        self.rate_limited = 0
+        self.slow = 0
+        self.prompt_chars = []
+        self.chat = SimpleNamespace(completions=_FakeCompletions(self))
+
+    def inject(self):
+        """Raise an injected 429, otherwise return the first-token delay, now and then from the slow tail"""
+        latency = self.latency
+        if random.random() < latency.rate_limit:
+            self.rate_limited += 1
+            raise FakeRateLimitError(latency.retry_after * latency.scale)
+        if random.random() < latency.slow_tail:
+            self.slow += 1
+            return latency.first_token * latency.slow_factor
+        return latency.first_token
+
+    def answer_tokens(self):
+        return [word + " " for word in self.answer_words]
+
+    def stream(self, tokens, first_token):
+        self.latency.sleep(first_token)
+        for token in tokens:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+            self.latency.sleep(1.0 / self.latency.tokens_per_second)
+
+class _FakeAsyncCompletions:
+    def __init__(self, client):
+        self.client = client
+
+    async def create(self, model=None, messages=None, stream=False, **kwargs):
+        self.client.calls += 1
+        self.client.prompt_chars.append(sum(len(m.get("content", "")) for m in messages or []))
+        first_token = self.client.inject()
+        tokens = self.client.answer_tokens()
+
+        if not stream:
+            await self.client.latency.async_sleep(first_token)
+            content = "".join(tokens)
+            return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+        return self.stream(tokens, first_token)
+
+    async def stream(self, tokens, first_token):
+        latency = self.client.latency
+        await latency.async_sleep(first_token)
+        for token in tokens:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+            await latency.async_sleep(1.0 / latency.tokens_per_second)
+
+class FakeAsyncGroqClient:
+    """Stand-in for groq.AsyncGroq, sharing answers and counters with a FakeGroqClient"""
+
+    def __init__(self, client):
+        self.chat = SimpleNamespace(completions=_FakeAsyncCompletions(client))
+
+class FakeCommunicate:
+    """Stand-in for edge_tts.Communicate producing one byte of 'audio' per character"""
+
+    latency = LatencyModel()
+
+    def __init__(self, text, voice=None, **kwargs):
+        self.text = text
+
+    async def stream(self):
+        await self.latency.async_sleep(self.latency.synthesis)
+        yield {"type": "audio", "data": self.text.encode("utf-8")}
+
+    async def save(self, path):
+        audio = bytearray()
+        async for chunk in self.stream():
+            audio.extend(chunk["data"])
+        with open(path, "wb") as f:
+            f.write(audio)
+
+class FakeMusic:
+    """Stand-in for pygame.mixer.music, 'plays' for a time proportional to the audio size"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.length = 0
+        self.ends = 0.0
+
+    def load(self, source, namehint=""):
+        if hasattr(source, "read"):
+            self.length = len(source.read())
+        else:
+            with open(source, "rb") as f:
+                self.length = len(f.read())
+
+    def play(self):
+        duration = self.length / self.latency.playback_chars_per_second
+        self.ends = time.perf_counter() + duration * self.latency.scale
+
+    def get_busy(self):
+        return time.perf_counter() < self.ends
+
+    def stop(self):
+        self.ends = 0.0
+
+class FakeClock:
+    def tick(self, framerate=0):
+        if framerate:
+            time.sleep(1.0 / framerate)
+
+def FakePygame(latency):
+    """Stand-in for the pygame module as used by TextToSpeech"""
+    return SimpleNamespace(
+        mixer=SimpleNamespace(init=lambda *a, **k: None, quit=lambda: None, music=FakeMusic(latency)),
+        time=SimpleNamespace(Clock=FakeClock),
+    )
+
+def FakeSearch(latency):
+    """Stand-in for googlesearch.search returning five canned results"""
+    def search(query, advanced=True, num_results=5, **kwargs):
+        latency.sleep(latency.search)
+        return [
+            SimpleNamespace(
+                url=f"https://site{i}.example.com/article?q={quote(query)}",
+                title=f"Result {i} for {query}",
+                description=f"A short description of result {i} about {query}.",
+            )
+            for i in range(num_results)
+        ]
+    return search
+
+def FakeFetchPage(latency):
+    """Stand-in for PageFetcher.fetch returning an article about the query in the url.
+    Every page repeats one syndicated paragraph, some pages are slow."""
+    async def fetch(url):
+        slow = 10 if random.random() < latency.slow_page else 1
+        await latency.async_sleep(latency.page * random.uniform(0.5, 1.5) * slow)
+        query = parse_qs(urlparse(url).query).get("q", [""])[0]
+        paragraphs = [
+            f"This page from {urlparse(url).hostname} covers {query} in some detail for readers who want more.",
+            f"Reports about {query} agree on the main facts and the most recent developments so far.",
+            "Sign up for our newsletter to get the latest stories delivered to your inbox every single day.",
+            " ".join(ANSWER_WORDS),
+        ]
+        body = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+        return f"<html><body><nav>Home News Sport</nav><article>{body}</article><footer>Contact us</footer></body></html>"
+    return fetch
+
+class FakeResponse:
+    def __init__(self, content, status_code=200, headers=None):
+        self.content = content
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.text = content.decode("utf-8", "replace")
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self):
+        return json.loads(self.content)
+
+class FakeHuggingFaceSession:
+    """Stand-in for the requests.Session posting to the HuggingFace inference endpoint"""
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.calls = 0
+
+    def post(self, url, headers=None, **kwargs):
+        self.calls += 1
+        self.latency.sleep(self.latency.image * random.uniform(0.8, 1.2))
+        image = base64.b64encode(b"\xff\xd8\xff" + bytes(256)).decode()
+        return FakeResponse(json.dumps({"images": [image]}).encode())
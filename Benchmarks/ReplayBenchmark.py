@@ -0,0 +1,257 @@
+"""Offline replay benchmark for the turn pipeline.
+
+Drives Main.MainExecution from a file of recorded queries, with Cohere, Groq,
+edge-tts, Google search and the HuggingFace endpoint replaced by the local
+fakes in Benchmarks/Fakes.py, and the microphone, face authentication and
+OS automation replaced by stand-ins. Runs with no network and no API keys.
+
+    python -m Benchmarks.ReplayBenchmark --repeat 3 --output results.json
+    python -m Benchmarks.ReplayBenchmark --scale 0 --baseline baseline.json
+"""
+from types import ModuleType, SimpleNamespace
+import tracemalloc
+import argparse
+import tempfile
+import queue
+import json
+import time
+import sys
+import os
+
+RepoRoot = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if RepoRoot not in sys.path:
+    sys.path.insert(0, RepoRoot)
+
+from Benchmarks.Fakes import (
+    LatencyModel, FakeCohereClient, FakeAsyncCohereClient, FakeGroqClient, FakeAsyncGroqClient,
+    FakeCommunicate, FakePygame, FakeSearch, FakeFetchPage, FakeHuggingFaceSession,
+)
+
+DefaultQueries = os.path.join(RepoRoot, "Benchmarks", "Queries.jsonl")
+
+def LoadQueries(path):
+    """Read {"query": ..., "decision": ...} lines, decision defaults to a general query"""
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                entry = json.loads(line)
+                entry.setdefault("decision", f"general {entry['query']}")
+                queries.append(entry)
+    return queries
+
+def PrepareSandbox(streaming, speculative):
+    """Run from a throwaway directory with a dummy .env so nothing touches the real Data/"""
+    sandbox = tempfile.mkdtemp(prefix="jarvis-bench-")
+    with open(os.path.join(sandbox, ".env"), "w") as f:
+        f.write("Username=Bench\nAssistantname=Jarvis\nAssistantVoice=en-US-GuyNeural\n")
+        f.write("CohereAPIKey=offline\nGroqAPIKey=offline\nHuggingFaceAPIKey=offline\n")
+        f.write(f"StreamingSpeech={streaming}\nSpeculativeAnswers={speculative}\n")
+    os.makedirs(os.path.join(sandbox, "Data", "Faces"), exist_ok=True)
+    os.chdir(sandbox)
+    return sandbox
+
+def InstallStandIns(latency, utterances):
+    """Replace the hardware and OS bound backends before Main imports them"""
+    from Backend.Tracing import traced
+
+    @traced("stt")
+    def SpeechRecognition(gui_update_queue=None, on_transcript=None):
+        try:
+            text = utterances.get_nowait()
+        except queue.Empty:
+            return None
+        if on_transcript:
+            on_transcript(text)
+        return text
+
+    @traced("automation")
+    async def Automation(commands):
+        await latency.async_sleep(latency.automation)
+        return True
+
+    @traced("advanced_system")
+    async def ProcessAdvancedCommand(user_input):
+        await latency.async_sleep(latency.automation)
+        return f"Command executed: {user_input}"
+
+    stand_ins = {
+        "Backend.VoiceRecognition": {"SpeechRecognition": SpeechRecognition},
+        "Backend.FaceAuthentication": {"authenticate_user": lambda: True},
+        "Backend.Automation": {"Automation": Automation},
+        "Backend.AdvancedAutomation": {"ProcessAdvancedCommand": ProcessAdvancedCommand},
+    }
+    for name, attrs in stand_ins.items():
+        module = ModuleType(name)
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+
+def LoadMain(latency, decisions, trace_path):
+    """Import Main and point every network client at the local fakes"""
+    import Main
+    import Backend.RealtimeSearchEngine as RealtimeSearchEngine
+    import Backend.PageFetcher as PageFetcher
+    import Backend.TextToSpeech as TextToSpeech
+    import Backend.ImageGeneration as ImageGeneration
+    from Backend.Clients import clients
+    from Backend.Tracing import tracer
+
+    groq = FakeGroqClient(latency)
+    cohere = FakeCohereClient(latency, decisions)
+    huggingface = FakeHuggingFaceSession(latency)
+    FakeCommunicate.latency = latency
+
+    clients.use(
+        groq=groq,
+        async_groq=FakeAsyncGroqClient(groq),
+        cohere=cohere,
+        async_cohere=FakeAsyncCohereClient(cohere),
+    )
+    RealtimeSearchEngine.search = FakeSearch(latency)
+    PageFetcher.page_fetcher.fetch = FakeFetchPage(latency)
+    # Keep the fetch deadline in proportion with the scaled page latencies
+    PageFetcher.page_fetcher.deadline = PageFetcher.PageDeadline * (latency.scale or 1.0)
+    TextToSpeech.edge_tts = SimpleNamespace(Communicate=FakeCommunicate)
+    TextToSpeech.pygame = FakePygame(latency)
+    ImageGeneration.session = huggingface
+    ImageGeneration.open_images = lambda prompt: None
+    tracer.path = trace_path
+    tracer.enabled = True
+
+    return Main, SimpleNamespace(groq=groq, cohere=cohere, huggingface=huggingface)
+
+def RunBenchmark(queries, repeat=1, latency=None, streaming=True, speculative=False):
+    latency = latency or LatencyModel()
+    sandbox = PrepareSandbox(streaming, speculative)
+    trace_path = os.path.join(sandbox, "Traces.jsonl")
+
+    utterances = queue.Queue()
+    InstallStandIns(latency, utterances)
+    decisions = {entry["query"]: entry["decision"] for entry in queries}
+    Main, fakes = LoadMain(latency, decisions, trace_path)
+    from Backend.AsyncRuntime import RunAsync
+    from Backend.RequestPolicy import llm_policy
+    from Backend.RealtimeSearchEngine import search_prefetcher
+    from Backend.Tracing import StageSummary
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    turns = 0
+    failures = 0
+    started = time.perf_counter()
+
+    for _ in range(repeat):
+        for entry in queries:
+            utterances.put(entry["query"])
+            if RunAsync(Main.MainExecution()) is False:
+                failures += 1
+            turns += 1
+            # Drain GUI messages the way the window would
+            while not Main.gui_update_queue.empty():
+                Main.gui_update_queue.get_nowait()
+
+    wall = time.perf_counter() - started
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    retained = after.compare_to(before, "filename")
+
+    return {
+        "turns": turns,
+        "failures": failures,
+        "wall_seconds": round(wall, 3),
+        "throughput_turns_per_second": round(turns / wall, 3) if wall else 0.0,
+        "stages": StageSummary(trace_path),
+        "allocations": {
+            "peak_kib": round(peak / 1024, 1),
+            "retained_kib": round(sum(stat.size_diff for stat in retained) / 1024, 1),
+            "retained_blocks": sum(stat.count_diff for stat in retained),
+        },
+        "calls": {
+            "cohere": fakes.cohere.calls,
+            "groq": fakes.groq.calls,
+            "huggingface": fakes.huggingface.calls,
+            "mean_prompt_chars": round(sum(fakes.groq.prompt_chars) / len(fakes.groq.prompt_chars), 1)
+            if fakes.groq.prompt_chars else 0,
+            "mean_classifier_prompt_chars": round(sum(fakes.cohere.prompt_chars) / len(fakes.cohere.prompt_chars), 1)
+            if fakes.cohere.prompt_chars else 0,
+            "injected_rate_limits": fakes.groq.rate_limited,
+            "injected_slow": fakes.groq.slow,
+        },
+        "policy": llm_policy.stats(),
+        "prefetch": search_prefetcher.stats(),
+        "settings": {"repeat": repeat, "scale": latency.scale, "streaming": streaming, "speculative": speculative},
+    }
+
+def CompareToBaseline(results, baseline, tolerance):
+    """Return a list of regressions beyond tolerance (a fraction, 0.25 = 25%)"""
+    regressions = []
+    old_throughput = baseline.get("throughput_turns_per_second", 0)
+    if old_throughput and results["throughput_turns_per_second"] < old_throughput * (1 - tolerance):
+        regressions.append(
+            f"throughput {results['throughput_turns_per_second']} < baseline {old_throughput}"
+        )
+
+    for name, old in baseline.get("stages", {}).items():
+        new = results["stages"].get(name)
+        # Sub-millisecond stages are too noisy to gate on
+        if new and old["p95"] >= 1.0 and new["p95"] > old["p95"] * (1 + tolerance):
+            regressions.append(f"{name} p95 {new['p95']:.1f} ms > baseline {old['p95']:.1f} ms")
+
+    old_peak = baseline.get("allocations", {}).get("peak_kib", 0)
+    if old_peak and results["allocations"]["peak_kib"] > old_peak * (1 + tolerance):
+        regressions.append(f"peak allocations {results['allocations']['peak_kib']} KiB > baseline {old_peak} KiB")
+    return regressions
+
+def PrintResults(results):
+    print(f"\nTurns: {results['turns']} ({results['failures']} failed) in {results['wall_seconds']} s, "
+          f"{results['throughput_turns_per_second']} turns/s")
+    print(f"{'stage':<24}{'count':>8}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}")
+    for name, stats in sorted(results["stages"].items(), key=lambda item: -item[1]["p50"]):
+        print(f"{name:<24}{stats['count']:>8}{stats['p50']:>12.1f}{stats['p95']:>12.1f}{stats['p99']:>12.1f}")
+    allocations = results["allocations"]
+    print(f"Allocations: peak {allocations['peak_kib']} KiB, retained {allocations['retained_kib']} KiB "
+          f"in {allocations['retained_blocks']} blocks")
+    print(f"Calls: {results['calls']}")
+    print(f"Request policy: {results['policy']}")
+    print(f"Search prefetch: {results['prefetch']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded queries against local fakes")
+    parser.add_argument("--queries", default=DefaultQueries)
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier for every fake latency, 0 disables them")
+    parser.add_argument("--tokens-per-second", type=float, default=250.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="fraction of LLM completions refused with a 429")
+    parser.add_argument("--slow-tail", type=float, default=0.0, help="fraction of LLM completions with a slow first token")
+    parser.add_argument("--no-streaming", action="store_true", help="disable streaming speech")
+    parser.add_argument("--speculative", action="store_true", help="enable speculative answering")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="fail if results regress against this JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    queries = LoadQueries(os.path.abspath(args.queries))
+    output = os.path.abspath(args.output) if args.output else None
+    baseline_path = os.path.abspath(args.baseline) if args.baseline else None
+
+    latency = LatencyModel(scale=args.scale, tokens_per_second=args.tokens_per_second,
+                           rate_limit=args.rate_limit, slow_tail=args.slow_tail)
+    results = RunBenchmark(queries, args.repeat, latency, not args.no_streaming, args.speculative)
+    PrintResults(results)
+
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=4)
+
+    if baseline_path:
+        with open(baseline_path, "r") as f:
+            regressions = CompareToBaseline(results, json.load(f), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}")
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
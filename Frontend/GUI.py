@@ -1,14 +1,13 @@
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QTextEdit, QStackedWidget, QWidget, QLineEdit, QGridLayout, QVBoxLayout, QHBoxLayout, QPushButton, QFrame, QLabel, QSizePolicy, QProgressBar)
-from PyQt5.QtGui import QIcon, QPainter, QMovie, QColor, QTextCharFormat, QFont, QPixmap, QTextBlockFormat
+from PyQt5.QtGui import QIcon, QPainter, QMovie, QColor, QTextCharFormat, QFont, QPixmap, QTextBlockFormat, QTextCursor
 from PyQt5.QtCore import Qt, QSize, QTimer, QThread, pyqtSignal
-from dotenv import dotenv_values
+from Backend.Config import env_vars
 import sys
 import os
 import queue
 import threading
 
 # Load environment variables
-env_vars = dotenv_values(".env")
 Assistantname = env_vars.get("Assistantname", "JARVIS")
 Username = env_vars.get("Username", "User")
 
@@ -17,6 +16,26 @@ current_dir = os.getcwd()
 TempDirPath = rf"{current_dir}\Frontend\Files"
 GraphicsDirPath = rf"{current_dir}\Frontend\Graphics"
 
+class QueueListener(QThread):
+    """Block on the GUI update queue and re-emit each message as a Qt signal"""
+    message = pyqtSignal(str, str)
+
+    def __init__(self, gui_update_queue, parent=None):
+        super().__init__(parent)
+        self.gui_update_queue = gui_update_queue
+
+    def run(self):
+        while True:
+            item = self.gui_update_queue.get()
+            if item is None:
+                break
+            message_type, content = item
+            self.message.emit(message_type, str(content))
+
+    def stop(self):
+        self.gui_update_queue.put(None)
+        self.wait()
+
 class AuthenticationScreen(QWidget):
     def __init__(self, parent=None, on_success=None):
         super().__init__(parent)
@@ -137,6 +156,9 @@ class ChatSection(QWidget):
         super(ChatSection, self).__init__()
         self.gui_update_queue = gui_update_queue
         self.mic_status_queue = mic_status_queue
+        # Answer still being generated, drawn at the end of the chat
+        self.partial_text = ""
+        self.partial_start = None
         self.initUI()
         
     def initUI(self):
@@ -189,23 +211,39 @@ class ChatSection(QWidget):
         layout.addWidget(self.status_label)
 
         self.setStyleSheet("background-color: black;")
-        
-        # Timer for updating GUI
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_from_queue)
-        self.timer.start(50)  # Update every 50ms for responsiveness
-
-    def update_from_queue(self):
-        """Update GUI from queue messages"""
-        try:
-            while not self.gui_update_queue.empty():
-                message_type, content = self.gui_update_queue.get_nowait()
-                if message_type == 'chat':
-                    self.addMessage(content, '#00FFFF')
-                elif message_type == 'status':
-                    self.status_label.setText(content)
-        except queue.Empty:
-            pass
+
+    def handle_message(self, message_type, content):
+        """Apply a message from the GUI update queue"""
+        if message_type == 'chat':
+            # Keep an answer in progress below messages that arrive meanwhile
+            partial = self.partial_text
+            self.setPartial("")
+            self.addMessage(content, '#00FFFF')
+            self.setPartial(partial)
+        elif message_type == 'partial':
+            self.setPartial(self.partial_text + content)
+        elif message_type == 'partial_done':
+            self.setPartial("")
+            self.addMessage(content, '#00FFFF')
+        elif message_type == 'partial_reset':
+            self.setPartial("")
+        elif message_type == 'status':
+            self.status_label.setText(content)
+
+    def setPartial(self, text):
+        """Redraw the answer in progress"""
+        if self.partial_start is not None:
+            cursor = self.chat_text_edit.textCursor()
+            cursor.setPosition(self.partial_start)
+            cursor.movePosition(QTextCursor.End, QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+            self.chat_text_edit.setTextCursor(cursor)
+            self.partial_start = None
+
+        self.partial_text = text
+        if text:
+            self.partial_start = self.chat_text_edit.document().characterCount() - 1
+            self.addMessage(text, '#00FFFF')
 
     def addMessage(self, message, color):
         cursor = self.chat_text_edit.textCursor()
@@ -289,20 +327,10 @@ class InitialScreen(QWidget):
         self.setFixedWidth(screen_width)
         self.setStyleSheet("background-color: black;")
 
-        # Timer for status updates
-        self.timer = QTimer(self)
-        self.timer.timeout.connect(self.update_status)
-        self.timer.start(100)
-
-    def update_status(self):
-        """Update status from queue"""
-        try:
-            while not self.gui_update_queue.empty():
-                message_type, content = self.gui_update_queue.get_nowait()
-                if message_type == 'status':
-                    self.status_label.setText(content)
-        except queue.Empty:
-            pass
+    def handle_message(self, message_type, content):
+        """Apply a status message from the GUI update queue"""
+        if message_type == 'status':
+            self.status_label.setText(content)
 
     def load_icon(self, path, width=80, height=80):
         pixmap = QPixmap(path)
@@ -331,8 +359,8 @@ class MessageScreen(QWidget):
         screen_height = desktop.screenGeometry().height()
         
         layout = QVBoxLayout()
-        chat_section = ChatSection(self.gui_update_queue, self.mic_status_queue)
-        layout.addWidget(chat_section)
+        self.chat_section = ChatSection(self.gui_update_queue, self.mic_status_queue)
+        layout.addWidget(self.chat_section)
         
         self.setLayout(layout)
         self.setStyleSheet("background-color: black;")
@@ -477,6 +505,12 @@ class MainWindow(QMainWindow):
         
         self.stacked_widget.addWidget(initial_screen)
         self.stacked_widget.addWidget(message_screen)
+
+        # Queue messages arrive as signals, so nothing polls while idle
+        self.listener = QueueListener(self.gui_update_queue, self)
+        self.listener.message.connect(initial_screen.handle_message)
+        self.listener.message.connect(message_screen.chat_section.handle_message)
+        self.listener.start()
         
         self.setGeometry(0, 0, screen_width, screen_height)
         self.setStyleSheet("background-color: black;")
@@ -493,8 +527,8 @@ class MainWindow(QMainWindow):
         """Show main interface after authentication"""
         self.stacked_widget.setCurrentIndex(1)
 
-def GraphicalUserInterface(gui_update_queue, mic_status_queue):
-    """Main GUI function"""
+def GraphicalUserInterface(gui_update_queue, mic_status_queue, on_ready=None):
+    """Main GUI function, on_ready is called once the event loop is running with the window shown"""
     app = QApplication(sys.argv)
     
     # Set application properties
@@ -502,7 +536,11 @@ def GraphicalUserInterface(gui_update_queue, mic_status_queue):
     app.setApplicationVersion("2.0")
     
     window = MainWindow(gui_update_queue, mic_status_queue)
+    app.aboutToQuit.connect(window.listener.stop)
     window.show()
+
+    if on_ready:
+        QTimer.singleShot(0, on_ready)
     
     sys.exit(app.exec_())
 
@@ -1,60 +1,74 @@
-from Frontend.GUI import GraphicalUserInterface
-from Backend.Model import FirstLayerDMM
-from Backend.RealtimeSearchEngine import RealtimeSearchEngine
-from Backend.Automation import Automation
-from Backend.AdvancedAutomation import ProcessAdvancedCommand
-from Backend.VoiceRecognition import SpeechRecognition
-from Backend.Chatbot import ChatBot
-from Backend.TextToSpeech import TextToSpeech
-from Backend.FaceAuthentication import authenticate_user
+from Backend.Startup import startup_timer, LazyBackend, WarmUp
+from Backend.Speculation import SpeculativeAnswer, IsGeneralOnly, speculation_stats
+from Backend.Dispatcher import PlanDecision, Dispatch
 from Backend.Utils import AnswerModifier, QueryModifier
-from dotenv import dotenv_values
-from asyncio import run
-from time import sleep
-import subprocess
+from Backend.AsyncRuntime import RunAsync, async_runtime
+from Backend.Tracing import tracer, traced
+from Backend.Config import env_vars
+from Backend.ChatLog import chat_log
+from Backend.Cache import FlushCaches
+import asyncio
+from time import sleep, perf_counter
 import threading
-import json
 import queue
 import sys
 import os
 
+# Backends are imported on first use or by the background warm-up,
+# so the window does not wait for microphones, clients or win32 imports
+FirstLayerDMM = LazyBackend("Backend.Model", "FirstLayerDMM")
+RealtimeSearchEngine = LazyBackend("Backend.RealtimeSearchEngine", "RealtimeSearchEngine")
+PrefetchSearch = LazyBackend("Backend.RealtimeSearchEngine", "PrefetchSearch")
+Automation = LazyBackend("Backend.Automation", "Automation")
+ProcessAdvancedCommand = LazyBackend("Backend.AdvancedAutomation", "ProcessAdvancedCommand")
+SpeechRecognition = LazyBackend("Backend.VoiceRecognition", "SpeechRecognition")
+ChatBot = LazyBackend("Backend.Chatbot", "ChatBot")
+SaveChatTurn = LazyBackend("Backend.Chatbot", "SaveChatTurn")
+TextToSpeech = LazyBackend("Backend.TextToSpeech", "TextToSpeech")
+StreamingTextToSpeech = LazyBackend("Backend.TextToSpeech", "StreamingTextToSpeech")
+authenticate_user = LazyBackend("Backend.FaceAuthentication", "authenticate_user")
+image_worker = LazyBackend("Backend.ImageGeneration", "image_worker")
+
+startup_timer.mark("core imports")
+
 # Load environment variables
-env_vars = dotenv_values(".env")
 Username = env_vars.get("Username", "User")
 Assistantname = env_vars.get("Assistantname", "Assistant")
+StreamingSpeech = env_vars.get("StreamingSpeech", "True").lower() == "true"
+SpeculativeAnswers = env_vars.get("SpeculativeAnswers", "False").lower() == "true"
 
 DefaultMessage = f"""{Username}: Hello {Assistantname}, How are you?
 {Assistantname}: Welcome {Username}. I am your advanced AI assistant with full system access. I can help you with anything from basic conversations to complex system operations. How may I assist you today?"""
 
 functions = ["open", "close", "play", "system", "content", "google search", "youtube search", "advanced_system"]
-subprocess_list = []
+
+class GuiUpdateQueue(queue.Queue):
+    """GUI message queue that drops a status message identical to the last one sent"""
+
+    def __init__(self):
+        super().__init__()
+        self.last_status = None
+
+    def put(self, item, block=True, timeout=None):
+        if isinstance(item, tuple) and item[0] == 'status':
+            with self.mutex:
+                if item[1] == self.last_status:
+                    return
+                self.last_status = item[1]
+        super().put(item, block, timeout)
 
 # Global queues for inter-thread communication
-gui_update_queue = queue.Queue()
+gui_update_queue = GuiUpdateQueue()
 mic_status_queue = queue.Queue()
 
 def ShowDefaultChatIfNoChats():
-    """Ensure a default chat log exists if no chats are logged"""
-    try:
-        with open(r'Data\ChatLog.json', "r", encoding='utf-8') as file:
-            if len(file.read()) < 5:
-                gui_update_queue.put(('chat', DefaultMessage))
-    except FileNotFoundError:
-        print("ChatLog.json file not found. Creating default response.")
-        os.makedirs("Data", exist_ok=True)
-        with open(r'Data\ChatLog.json', "w", encoding='utf-8') as file:
-            file.write("[]")
+    """Show the default greeting if no chats are logged"""
+    if not len(chat_log):
         gui_update_queue.put(('chat', DefaultMessage))
 
 def ReadChatLogJson():
-    """Read chat log from JSON"""
-    try:
-        with open(r'Data\ChatLog.json', 'r', encoding='utf-8') as file:
-            chatlog_data = json.load(file)
-        return chatlog_data
-    except FileNotFoundError:
-        print("ChatLog.json not found.")
-        return []
+    """Read every message in the chat log"""
+    return chat_log.read_all()
 
 def ChatLogIntegration():
     """Integrate chat logs into a readable format"""
@@ -69,6 +83,17 @@ def ChatLogIntegration():
     if formatted_chatlog:
         gui_update_queue.put(('chat', AnswerModifier(formatted_chatlog)))
 
+def OnImageJobUpdate(job):
+    """Forward image generation job events to the GUI"""
+    if job.status == "done":
+        gui_update_queue.put(('chat', f"{Assistantname}: Images ready for '{job.prompt}' (job {job.id})."))
+        gui_update_queue.put(('status', "Images generated"))
+    elif job.status == "failed":
+        gui_update_queue.put(('chat', f"{Assistantname}: Image generation failed for '{job.prompt}': {job.error}"))
+        gui_update_queue.put(('status', "Image generation failed"))
+    elif job.status == "cancelled":
+        gui_update_queue.put(('status', f"Image job {job.id} cancelled"))
+
 def InitialExecution():
     """Initial execution setup"""
     print("Initializing JARVIS Advanced AI Assistant...")
@@ -84,147 +109,195 @@ def InitialExecution():
     gui_update_queue.put(('status', "JARVIS ready with full system access..."))
     print("JARVIS initialized successfully with advanced capabilities!")
 
+def PartialAnswerSink():
+    """on_token callback showing an answer in the chat window while it is generated"""
+    started = False
+
+    def on_token(text):
+        nonlocal started
+        if not started:
+            started = True
+            text = f"{Assistantname}: {text}"
+        gui_update_queue.put(('partial', text))
+
+    return on_token
+
+def AnswerAndSpeak(AnswerFunc, Query):
+    """Run an answering backend and speak its answer.
+
+    The answer appears in the chat window as it is generated. In streaming
+    mode speech starts on the first finished sentence while the model is
+    still generating, otherwise the full answer is spoken at the end.
+    """
+    show_partial = PartialAnswerSink()
+
+    if not StreamingSpeech:
+        try:
+            Answer = AnswerFunc(Query, on_token=show_partial)
+        except BaseException:
+            # Drop the half-shown answer so the next one does not continue it
+            gui_update_queue.put(('partial_reset', None))
+            raise
+        gui_update_queue.put(('partial_done', f"{Assistantname}: {Answer}"))
+        gui_update_queue.put(('status', "Speaking..."))
+        TextToSpeech(Answer)
+        return Answer
+
+    speaker = StreamingTextToSpeech()
+
+    def on_token(text):
+        show_partial(text)
+        speaker.feed(text)
+
+    try:
+        Answer = AnswerFunc(Query, on_token=on_token)
+        if not speaker.text:
+            # Nothing was streamed (e.g. a connection error message)
+            speaker.feed(Answer)
+    except BaseException:
+        gui_update_queue.put(('partial_reset', None))
+        raise
+    finally:
+        speaker.finish()
+
+    gui_update_queue.put(('partial_done', f"{Assistantname}: {Answer}"))
+    gui_update_queue.put(('status', "Speaking..."))
+    speaker.wait()
+    return Answer
+
+@traced("turn", new_trace=True)
 async def MainExecution():
     """Main execution logic with advanced system capabilities"""
+    speculation = None
     try:
-        TaskExecution = False
-        ImageExecution = False
-        AdvancedSystemExecution = False
-        ImageGenerationQuery = ""
-
         gui_update_queue.put(('status', "Listening..."))
-        Query = SpeechRecognition(gui_update_queue)
+        # A realtime-sounding transcript starts its web search now, overlapping classification
+        Query = await asyncio.to_thread(SpeechRecognition, gui_update_queue, PrefetchSearch)
         
         if not Query:
             return False
             
         gui_update_queue.put(('chat', f"{Username}: {Query}"))
         gui_update_queue.put(('status', "Analyzing command..."))
-        
-        Decision = FirstLayerDMM(Query)
+
+        # Speculatively start a general answer while the query is classified
+        if SpeculativeAnswers:
+            speculation = SpeculativeAnswer(ChatBot, QueryModifier(Query), SaveChatTurn)
+
+        ClassifyStart = perf_counter()
+        Decision = await asyncio.to_thread(FirstLayerDMM, Query)
         print(f"\nDecision: {Decision}\n")
+        tracer.annotate(decision=Decision)
+
+        if speculation:
+            if IsGeneralOnly(Decision):
+                speculation_stats.record(True, perf_counter() - ClassifyStart)
+            else:
+                speculation.cancel()
+                speculation_stats.record(False)
+                speculation = None
+            print(f"Speculation stats: {speculation_stats.summary()}")
 
-        G = any([i for i in Decision if i.startswith("general")])
-        R = any([i for i in Decision if i.startswith("realtime")])
-        A = any([i for i in Decision if i.startswith("advanced_system")])
-
-        Merged_query = " and ".join(
-            [" ".join(i.split()[1:]) for i in Decision if i.startswith("general") or i.startswith("realtime")]
-        )
-
-        # Check for advanced system commands
-        for queries in Decision:
-            if queries.startswith("advanced_system"):
-                AdvancedSystemExecution = True
-                gui_update_queue.put(('status', "Executing advanced system command..."))
-                command_text = queries.replace("advanced_system", "").strip()
-                result = await ProcessAdvancedCommand(command_text)
-                gui_update_queue.put(('chat', f"{Assistantname}: {result}"))
-                gui_update_queue.put(('status', "Command executed successfully"))
-                TextToSpeech("Command executed successfully")
-                return True
-
-        # Check for image generation
-        for queries in Decision:
-            if "generate" in queries:
-                ImageGenerationQuery = str(queries)
-                ImageExecution = True
-
-        # Check for basic automation tasks
-        for queries in Decision:
-            if not TaskExecution:
-                if any(queries.startswith(func) for func in ["open", "close", "play", "system", "content", "google search", "youtube search"]):
-                    gui_update_queue.put(('status', "Executing commands..."))
-                    run(Automation(list(Decision)))
-                    TaskExecution = True
-
-        # Handle image generation
-        if ImageExecution:
+        async def RunAdvancedCommand(step):
+            gui_update_queue.put(('status', "Executing advanced system command..."))
+            result = await ProcessAdvancedCommand(step.payload)
+            gui_update_queue.put(('chat', f"{Assistantname}: {result}"))
+            gui_update_queue.put(('status', "Command executed successfully"))
+            await asyncio.to_thread(TextToSpeech, "Command executed successfully")
+            return result
+
+        async def RunAutomation(step):
+            gui_update_queue.put(('status', "Executing commands..."))
+            return await Automation([step.payload])
+
+        async def RunImageGeneration(step):
             gui_update_queue.put(('status', "Generating images..."))
-            with open(r'Frontend\Files\ImageGeneration.data', "w") as file:
-                file.write(f"{ImageGenerationQuery},True")
-
-            try:
-                p1 = subprocess.Popen(
-                    ['python', r"Backend\ImageGeneration.py"],
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    stdin=subprocess.PIPE,
-                    shell=False,
-                )
-                subprocess_list.append(p1)
-            except Exception as e:
-                print(f"Error starting ImageGeneration.py: {e}")
-
-        # Handle queries
-        if G and R or R:
-            gui_update_queue.put(('status', "Searching for real-time information..."))
-            Answer = RealtimeSearchEngine(QueryModifier(Merged_query))
+            job_id = image_worker.submit(step.payload)
+            print(f"Queued image generation job {job_id}")
+            return job_id
+
+        async def RunAnswer(step):
+            realtime, QueryFinal = step.payload
+            if realtime:
+                gui_update_queue.put(('status', "Searching for real-time information..."))
+                AnswerFunc = RealtimeSearchEngine
+            else:
+                gui_update_queue.put(('status', "Processing query..."))
+                AnswerFunc = speculation.answer if speculation else ChatBot
+            return await asyncio.to_thread(AnswerAndSpeak, AnswerFunc, QueryModifier(QueryFinal))
+
+        async def RunExit(step):
+            QueryFinal = "Goodbye! It was nice talking to you. JARVIS signing off."
+            Answer = await asyncio.to_thread(ChatBot, QueryModifier(QueryFinal))
             gui_update_queue.put(('chat', f"{Assistantname}: {Answer}"))
-            gui_update_queue.put(('status', "Speaking..."))
-            TextToSpeech(Answer)
-            return True
-        else:
-            for queries in Decision:
-                if "general" in queries:
-                    gui_update_queue.put(('status', "Processing query..."))
-                    QueryFinal = queries.replace("general", "")
-                    Answer = ChatBot(QueryModifier(QueryFinal))
-                    gui_update_queue.put(('chat', f"{Assistantname}: {Answer}"))
-                    gui_update_queue.put(('status', "Speaking..."))
-                    TextToSpeech(Answer)
-                    return True
-                elif "realtime" in queries:
-                    gui_update_queue.put(('status', "Searching for information..."))
-                    QueryFinal = queries.replace("realtime", "")
-                    Answer = RealtimeSearchEngine(QueryModifier(QueryFinal))
-                    gui_update_queue.put(('chat', f"{Assistantname}: {Answer}"))
-                    gui_update_queue.put(('status', "Speaking..."))
-                    TextToSpeech(Answer)
-                    return True
-                elif "exit" in queries:
-                    QueryFinal = "Goodbye! It was nice talking to you. JARVIS signing off."
-                    Answer = ChatBot(QueryModifier(QueryFinal))
-                    gui_update_queue.put(('chat', f"{Assistantname}: {Answer}"))
-                    gui_update_queue.put(('status', "Goodbye..."))
-                    TextToSpeech(Answer)
-                    sys.exit(0)
-                    
+            gui_update_queue.put(('status', "Goodbye..."))
+            await asyncio.to_thread(TextToSpeech, Answer)
+            return "exit"
+
+        # Every part of the decision runs at once, speech is serialized by the TTS playback lock
+        handlers = {
+            "advanced_system": RunAdvancedCommand,
+            "automation": RunAutomation,
+            "image": RunImageGeneration,
+            "answer": RunAnswer,
+            "exit": RunExit,
+        }
+        results = await Dispatch(PlanDecision(Decision), handlers)
+
+        if any(result == "exit" for _, result in results):
+            return "exit"
+        if any(isinstance(result, Exception) for _, result in results):
+            gui_update_queue.put(('status', "Error occurred"))
+            return False
+        return True
+
     except Exception as e:
+        if speculation:
+            speculation.cancel()
         print(f"Error in MainExecution: {e}")
         gui_update_queue.put(('status', "Error occurred"))
         return False
 
 def FirstThread():
-    """Thread for primary execution loop"""
-    mic_listening = False
-    
+    """Thread for primary execution loop, sleeps until the microphone is toggled"""
     while True:
         try:
-            # Check microphone status from GUI
-            try:
-                mic_status = mic_status_queue.get_nowait()
-                mic_listening = mic_status
-                print(f"Microphone status changed: {mic_listening}")
-            except queue.Empty:
-                pass
+            gui_update_queue.put(('status', "Ready to assist with full system access..."))
+
+            # Block until the GUI toggles the microphone
+            mic_listening = mic_status_queue.get()
+            print(f"Microphone status changed: {mic_listening}")
 
             if mic_listening:
                 print("Executing MainExecution")
-                run(MainExecution())
-                mic_listening = False  # Reset after processing
-            else:
-                gui_update_queue.put(('status', "Ready to assist with full system access..."))
-                sleep(0.1)
+                # MainExecution runs on the shared event loop, blocking work inside it goes to threads
+                if RunAsync(MainExecution()) == "exit":
+                    async_runtime.shutdown()
+                    # os._exit skips atexit, write the caches' pending saves first
+                    FlushCaches()
+                    os._exit(0)
                 
         except Exception as e:
             print(f"Error in FirstThread: {e}")
             sleep(1)
 
+def WarmUpBackends():
+    """Load the backends in the background once the window is on screen"""
+    startup_timer.mark("window interactive")
+    WarmUp(
+        [FirstLayerDMM, ChatBot, RealtimeSearchEngine, TextToSpeech, Automation, ProcessAdvancedCommand, image_worker],
+        hooks=[
+            ("image worker listener", lambda: image_worker.add_listener(OnImageJobUpdate)),
+            ("microphone calibration", lambda: SpeechRecognition.load().GetVoiceRecognizer()),
+        ],
+        on_done=lambda: print(startup_timer.report()),
+    )
+
 def SecondThread():
     """Thread for GUI execution"""
     try:
-        GraphicalUserInterface(gui_update_queue, mic_status_queue)
+        from Frontend.GUI import GraphicalUserInterface
+        GraphicalUserInterface(gui_update_queue, mic_status_queue, on_ready=WarmUpBackends)
     except Exception as e:
         print(f"Error in SecondThread: {e}")
 
@@ -248,6 +321,12 @@ def AuthenticationThread():
         sys.exit(1)
 
 if __name__ == "__main__":
+    if "--headless" in sys.argv:
+        # Serve the backends over the local HTTP/WebSocket API, no window or microphone
+        from Backend.Server import RunServer
+        RunServer()
+        sys.exit(0)
+
     print("Starting JARVIS Advanced AI Assistant with Full System Access...")
     print("Capabilities:")
     print("- Natural Language Processing")
@@ -262,6 +341,7 @@ if __name__ == "__main__":
     
     # Initialize
     InitialExecution()
+    startup_timer.mark("initial execution")
     
     # Start authentication (in background for now)
     auth_thread = threading.Thread(target=AuthenticationThread, daemon=True)
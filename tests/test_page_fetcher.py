@@ -0,0 +1,64 @@
+"""PageFetcher against a local server that sends pages in chunks, like real sites do.
+
+Run from the repository root: python -m unittest discover tests
+"""
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+import unittest
+import asyncio
+import sys
+import os
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from Backend.PageFetcher import PageFetcher
+
+Head = "<html><head><title>Test</title>" + "<meta name='filler' content='x'>" * 100 + "</head>"
+Article = "<body><article><p>" + "The article text arrives after the head in a later chunk. " * 3 + "</p></article></body></html>"
+
+async def ChunkedPage(request):
+    response = web.StreamResponse(headers={"Content-Type": "text/html; charset=utf-8"})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    await response.write(Head.encode())
+    # Give the client time to see the first chunk on its own
+    await asyncio.sleep(0.2)
+    await response.write(Article.encode())
+    await response.write_eof()
+    return response
+
+async def LargePage(request):
+    response = web.StreamResponse(headers={"Content-Type": "text/html"})
+    response.enable_chunked_encoding()
+    await response.prepare(request)
+    for _ in range(8):
+        await response.write(b"x" * 4096)
+        await asyncio.sleep(0.01)
+    await response.write_eof()
+    return response
+
+class PageFetcherTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        app = web.Application()
+        app.router.add_get("/chunked", ChunkedPage)
+        app.router.add_get("/large", LargePage)
+        self.server = TestServer(app)
+        await self.server.start_server()
+        self.fetcher = PageFetcher(deadline=5, max_bytes=10000)
+
+    async def asyncTearDown(self):
+        await self.fetcher.close()
+        await self.server.close()
+
+    async def test_fetch_reads_past_the_first_chunk(self):
+        html = await self.fetcher.fetch(str(self.server.make_url("/chunked")))
+        self.assertIn("<article>", html)
+        self.assertIn("later chunk", await self.fetcher.page_text(str(self.server.make_url("/chunked"))))
+
+    async def test_fetch_stops_at_max_bytes(self):
+        html = await self.fetcher.fetch(str(self.server.make_url("/large")))
+        self.assertEqual(len(html), 10000)
+
+if __name__ == "__main__":
+    unittest.main()